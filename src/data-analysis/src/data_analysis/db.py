@@ -1,14 +1,24 @@
 """Database management for query history."""
 
+from __future__ import annotations
+
+import atexit
+import itertools
 import os
 import re
 import sys
-from threading import Lock
-from typing import Optional
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+from threading import Event, Lock, Thread
+from typing import TYPE_CHECKING, Iterator, Optional
 
-import duckdb
 
 from core import WORKSPACE, get_workspace_file
+from tabulate import tabulate
+
+if TYPE_CHECKING:
+    import duckdb
 
 
 def _get_env_int(name: str, default: int, min_value: int = 1, max_value: Optional[int] = None) -> int:
@@ -23,18 +33,18 @@ def _get_env_int(name: str, default: int, min_value: int = 1, max_value: Optiona
     Returns:
         Validated integer value
     """
+    raw = os.environ.get(name)
+    if raw is None:
+        return default
     try:
-        value = int(os.getenv(name, default))
+        value = int(raw)
         if value < min_value:
             raise ValueError(f"Must be >= {min_value}")
         if max_value is not None and value > max_value:
             raise ValueError(f"Must be <= {max_value}")
         return value
     except ValueError as e:
-        print(
-            f"Warning: Invalid {name}='{os.getenv(name)}' ({e}), using default {default}",
-            file=sys.stderr,
-        )
+        print(f"Warning: Invalid {name}='{raw}' ({e}), using default {default}", file=sys.stderr)
         return default
 
 
@@ -48,6 +58,69 @@ MAX_HISTORY_SIZE = _get_env_int(
 CLEANUP_FREQUENCY = _get_env_int(
     "DATA_ANALYSIS_CLEANUP_FREQUENCY", 10, min_value=1, max_value=1000
 )  # Default: every 10 queries, min 1 (prevents division by zero), max 1000
+MAX_LIMIT = 1000  # Upper bound for the limit argument of history readers
+FLUSH_BATCH_SIZE = _get_env_int(
+    "DATA_ANALYSIS_FLUSH_BATCH_SIZE", 32, min_value=1, max_value=1000
+)  # Default: buffer 32 logged queries per batched insert, min 1 (insert immediately), max 1000
+
+
+_LIMIT_ERROR = f"Error: limit must be between 1 and {MAX_LIMIT}"
+
+# Escapes SQL LIKE wildcards (and the escape character itself) in one pass
+_LIKE_ESCAPE_TABLE = str.maketrans({"\\": "\\\\", "%": "\\%", "_": "\\_"})
+
+# SQL reused on the long-lived connection
+_INSERT_SQL = """
+    INSERT INTO query_history (timestamp, query, result, execution_time_ms, row_count, error, success)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+# IDs come from a monotonic sequence, so the newest N rows are exactly those above
+# currval - N; a range predicate avoids sorting the table to find the cutoff.
+# currval is always defined here because a cleanup is only ever due once a row was logged,
+# and that row is inserted no later than the cleanup runs.
+_CLEANUP_SQL = """
+    DELETE FROM query_history
+    WHERE id <= currval('query_history_id_seq') - ?
+"""
+_HISTORY_SQL = """
+    SELECT
+        id,
+        timestamp,
+        query,
+        execution_time_ms,
+        row_count,
+        success
+    FROM query_history
+    ORDER BY id DESC
+    LIMIT ?
+"""
+_SEARCH_SQL = """
+    SELECT
+        id,
+        timestamp,
+        query,
+        execution_time_ms,
+        row_count,
+        success
+    FROM query_history
+    WHERE query ILIKE '%' || ? || '%' ESCAPE '\\'
+    ORDER BY id DESC
+    LIMIT ?
+"""
+_GET_RESULT_SQL = """
+    SELECT query, result, error, success
+    FROM query_history
+    WHERE id = ?
+"""
+
+
+def _rows_to_markdown(columns: list[str], rows: list[tuple]) -> str:
+    """Render query rows as a markdown pipe table without building a DataFrame.
+
+    Uses the same tabulate "pipe" format DataFrame.to_markdown() used, so multi-line
+    values wrap into continuation rows and NULLs render as empty cells.
+    """
+    return tabulate(rows, headers=columns, tablefmt="pipe")
 
 
 class HistoryDB:
@@ -76,9 +149,21 @@ class HistoryDB:
             db_path = str(new_db_path)
 
         self.db_path = db_path
-        self._counter_lock = Lock()  # Lock for thread-safe counter increment
-        self._cleanup_in_progress = False  # Flag to prevent concurrent cleanup
-        self._init_schema()
+        # One connection for the lifetime of the instance; DuckDB connections are not
+        # safe for concurrent use, so every statement runs under _db_lock
+        # Imported here so loading the module (and the math tools) doesn't pay for DuckDB
+        import duckdb
+
+        self._conn = duckdb.connect(self.db_path)
+        self._db_lock = Lock()
+        # Rows logged but not yet inserted; flushed in batches, before every read and at exit
+        self._pending: list[tuple] = []
+        self._cleanup_due = False  # Trim the table with the next flush
+        # Keeps the instance alive until close() so a partial batch isn't lost at exit
+        atexit.register(self.flush)
+        self._tune_connection()
+        # Schema DDL and the counter seed run on first use, not when the instance is created
+        self._schema_ready = Event()
 
         # Set secure permissions on database file (owner-only read/write)
         # This is critical since the DB contains query results with potentially sensitive data
@@ -89,39 +174,152 @@ class HistoryDB:
             # The directory-level permissions provide some protection
             pass
 
-        # Initialize counter from database to prevent drift after restart/clear
-        with duckdb.connect(self.db_path) as conn:
-            count = conn.execute("SELECT COUNT(*) FROM query_history").fetchone()[0]
-            self._query_count = count
-
-    def _init_schema(self):
-        """Initialize the database schema."""
-        with duckdb.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE SEQUENCE IF NOT EXISTS query_history_id_seq START 1
-            """)
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS query_history (
-                    id INTEGER PRIMARY KEY DEFAULT nextval('query_history_id_seq'),
-                    timestamp TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
-                    query TEXT NOT NULL,
-                    result TEXT,
-                    execution_time_ms DOUBLE,
-                    row_count INTEGER,
-                    error TEXT,
-                    success BOOLEAN
-                )
-            """)
-            # Create indexes for better query performance
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_query_history_timestamp ON query_history(timestamp)
-            """)
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_query_history_query ON query_history(query)
-            """)
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_query_history_success ON query_history(success)
-            """)
+        # Full batches and cleanups are written by a background thread so log_query
+        # never waits on disk I/O; readers still flush synchronously to see every row
+        self._closed = False
+        self._wakeup = Event()
+        self._writer = Thread(target=self._drain, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def close(self):
+        """Flush buffered queries and close the database connection."""
+        atexit.unregister(self.flush)
+        self._closed = True
+        self._wakeup.set()
+        self._writer.join()
+        with self._db_lock:
+            self._flush_pending()
+            self._conn.close()
+
+    @contextmanager
+    def _reader(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """Flush buffered writes and yield a cursor for one read.
+
+        Cursors share the connection's database and catalog but are independent
+        query contexts, so concurrent reads don't queue on _db_lock. Creating one
+        costs microseconds, so each read gets its own instead of a pooled one.
+        """
+        self._ensure_schema()
+        with self._db_lock:
+            self._flush_pending()
+            cursor = self._conn.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    def flush(self):
+        """Write any buffered queries to the database."""
+        with self._db_lock:
+            self._flush_pending()
+
+    def _drain(self):
+        """Writer thread: flush whenever log_query signals a full batch or a due cleanup."""
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self._closed:
+                return
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Warning: Failed to write query history: {e}", file=sys.stderr)
+
+    def _flush_pending(self):
+        """Insert buffered queries and run a due cleanup in one transaction.
+
+        Caller must hold _db_lock.
+        """
+        if not self._pending and not self._cleanup_due:
+            return
+        rows, self._pending = self._pending, []
+        cleanup, self._cleanup_due = self._cleanup_due, False
+        self._secure_wal()
+        # Without an explicit transaction every row (and the cleanup) would commit and
+        # hit the WAL separately
+        self._conn.execute("BEGIN TRANSACTION")
+        try:
+            if rows:
+                self._conn.executemany(_INSERT_SQL, rows)
+            if cleanup:
+                # Keep only the last MAX_HISTORY_SIZE queries
+                self._conn.execute(_CLEANUP_SQL, [MAX_HISTORY_SIZE])
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _tune_connection(self):
+        """Tune the connection for small writes."""
+        with self._db_lock:
+            # History traffic is tiny batched inserts and small reads: skip thread
+            # fan-out and cap memory
+            self._conn.execute("PRAGMA threads=1")
+            self._conn.execute("PRAGMA memory_limit='128MB'")
+            # Every history read orders by id, so inserts need not keep row order
+            self._conn.execute("SET preserve_insertion_order=false")
+
+    def _secure_wal(self):
+        """Make sure the WAL file exists and is owner-only before a write. Caller must hold _db_lock.
+
+        DuckDB deletes the WAL at every checkpoint and would recreate it with the
+        default umask (typically 0644), exposing logged results; an existing WAL is
+        appended to as-is, so creating it first keeps it as private as the database.
+        """
+        wal_path = self.db_path + ".wal"
+        try:
+            os.close(os.open(wal_path, os.O_CREAT | os.O_WRONLY, 0o600))
+            # Also tightens a WAL left behind with wider permissions
+            os.chmod(wal_path, 0o600)
+        except OSError:
+            # Same fallback as the database file: directory permissions still apply
+            pass
+
+    def _ensure_schema(self):
+        """Create the schema and seed the query counter on first use."""
+        if self._schema_ready.is_set():
+            return
+        with self._db_lock:
+            if self._schema_ready.is_set():
+                return
+            self._secure_wal()
+            self._create_schema()
+            # Initialize counter from database to prevent drift after restart/clear
+            count = self._conn.execute("SELECT COUNT(*) FROM query_history").fetchone()[0]
+            # next() on itertools.count is atomic under the GIL, so increments need no lock
+            self._query_counter = itertools.count(count + 1)
+            self._schema_ready.set()
+
+    def _create_schema(self):
+        """Create the sequence, table and indexes if missing. Caller must hold _db_lock."""
+        conn = self._conn
+        conn.execute("""
+            CREATE SEQUENCE IF NOT EXISTS query_history_id_seq START 1
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS query_history (
+                id INTEGER PRIMARY KEY DEFAULT nextval('query_history_id_seq'),
+                timestamp TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+                query TEXT NOT NULL,
+                result TEXT,
+                execution_time_ms DOUBLE,
+                row_count INTEGER,
+                error TEXT,
+                success BOOLEAN
+            )
+        """)
+        # Create indexes for better query performance
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_query_history_timestamp ON query_history(timestamp)
+        """)
+        # search_history's unanchored ILIKE can't use an index on query, which only
+        # slowed every insert; drop it from databases created by older versions
+        conn.execute("""
+            DROP INDEX IF EXISTS idx_query_history_query
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_query_history_success ON query_history(success)
+        """)
 
     def log_query(
         self,
@@ -144,58 +342,26 @@ class HistoryDB:
         """
         # Truncate large results to prevent memory issues
         if result and len(result) > MAX_RESULT_SIZE:
-            # Try to find the last complete line/row before MAX_RESULT_SIZE
-            # to avoid breaking markdown table formatting mid-row
-            truncated = result[:MAX_RESULT_SIZE]
-            last_newline = truncated.rfind("\n")
-            if last_newline > 0:
-                # Truncate at last complete line
-                truncated = result[:last_newline]
-            result = truncated + "\n\n... (result truncated due to size limit)"
-
-        # Insert query in its own transaction
-        with duckdb.connect(self.db_path) as conn:
-            conn.execute(
-                """
-                INSERT INTO query_history (query, result, execution_time_ms, row_count, error, success)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """,
-                [query, result, execution_time_ms, row_count, error, success],
-            )
-
-        # Thread-safe counter increment and cleanup check
-        with self._counter_lock:
-            self._query_count += 1
-            if self._query_count % CLEANUP_FREQUENCY == 0 and not self._cleanup_in_progress:
-                self._cleanup_in_progress = True
-                should_cleanup = True
-            else:
-                should_cleanup = False
-
-        # Run cleanup in separate transaction to avoid rolling back the insert
-        if should_cleanup:
-            try:
-                with duckdb.connect(self.db_path) as conn:
-                    # Keep only the last MAX_HISTORY_SIZE queries
-                    # Use ID-based deletion which leverages primary key index
-                    # This operation is idempotent - safe if multiple threads execute it
-                    conn.execute(
-                        """
-                        DELETE FROM query_history
-                        WHERE id < (
-                            SELECT MIN(id) FROM (
-                                SELECT id FROM query_history
-                                ORDER BY id DESC
-                                LIMIT ?
-                            )
-                        )
-                    """,
-                        [MAX_HISTORY_SIZE],
-                    )
-            finally:
-                # Always reset cleanup flag
-                with self._counter_lock:
-                    self._cleanup_in_progress = False
+            # Cut at the last complete line/row before MAX_RESULT_SIZE to avoid breaking
+            # markdown table formatting mid-row; rfind bounds the search, so only the
+            # kept prefix is ever copied
+            last_newline = result.rfind("\n", 0, MAX_RESULT_SIZE)
+            cut = last_newline if last_newline > 0 else MAX_RESULT_SIZE
+            result = result[:cut] + "\n\n... (result truncated due to size limit)"
+
+        self._ensure_schema()
+
+        # Buffer the row; the writer thread inserts it with the next batch, or the
+        # next read flushes it first
+        row = (datetime.now(timezone.utc), query, result, execution_time_ms, row_count, error, success)
+        should_cleanup = next(self._query_counter) % CLEANUP_FREQUENCY == 0
+        with self._db_lock:
+            self._pending.append(row)
+            # Cleanup rides along with the next flush, in the same transaction as the insert
+            self._cleanup_due = self._cleanup_due or should_cleanup
+            wake_writer = self._cleanup_due or len(self._pending) >= FLUSH_BATCH_SIZE
+        if wake_writer:
+            self._wakeup.set()
 
     def get_history(self, limit: int = 20) -> str:
         """Get recent query history.
@@ -207,30 +373,17 @@ class HistoryDB:
             Query history as markdown table
         """
         # Validate limit parameter
-        if limit < 1 or limit > 1000:
-            return "Error: limit must be between 1 and 1000"
-
-        with duckdb.connect(self.db_path) as conn:
-            result = conn.execute(
-                """
-                SELECT
-                    id,
-                    timestamp,
-                    query,
-                    execution_time_ms,
-                    row_count,
-                    success
-                FROM query_history
-                ORDER BY id DESC
-                LIMIT ?
-            """,
-                [limit],
-            ).fetchdf()
-
-            if result.empty:
-                return "No query history found."
-
-            return result.to_markdown(index=False)
+        if not 1 <= limit <= MAX_LIMIT:
+            return _LIMIT_ERROR
+
+        with self._reader() as cursor:
+            rows = cursor.execute(_HISTORY_SQL, [limit]).fetchall()
+            columns = [column[0] for column in cursor.description]
+
+        if not rows:
+            return "No query history found."
+
+        return _rows_to_markdown(columns, rows)
 
     def get_query_result(self, query_id: int) -> str:
         """Get the cached result of a previous query.
@@ -245,31 +398,24 @@ class HistoryDB:
         if query_id < 1:
             return f"Error: query_id must be a positive integer (got {query_id})"
 
-        with duckdb.connect(self.db_path) as conn:
-            result = conn.execute(
-                """
-                SELECT query, result, error, success
-                FROM query_history
-                WHERE id = ?
-            """,
-                [query_id],
-            ).fetchone()
+        with self._reader() as cursor:
+            result = cursor.execute(_GET_RESULT_SQL, [query_id]).fetchone()
 
-            if result is None:
-                return f"Query ID {query_id} not found in history."
+        if result is None:
+            return f"Query ID {query_id} not found in history."
 
-            query, cached_result, error, success = result
+        query, cached_result, error, success = result
 
-            if not success:
-                # Sanitize error message to avoid leaking sensitive information
-                # Remove file paths, internal database details, etc.
-                sanitized_error = self._sanitize_error(error) if error else "Unknown error"
-                return f"Query failed with error:\n{sanitized_error}\n\nQuery was:\n{query}"
+        if not success:
+            # Sanitize error message to avoid leaking sensitive information
+            # Remove file paths, internal database details, etc.
+            sanitized_error = self._sanitize_error(error) if error else "Unknown error"
+            return f"Query failed with error:\n{sanitized_error}\n\nQuery was:\n{query}"
 
-            if cached_result is None:
-                return f"No cached result for query ID {query_id}."
+        if cached_result is None:
+            return f"No cached result for query ID {query_id}."
 
-            return cached_result
+        return cached_result
 
     def _sanitize_error(self, error: str) -> str:
         """Sanitize error messages to prevent information leakage.
@@ -316,35 +462,21 @@ class HistoryDB:
             Matching queries as markdown table
         """
         # Validate limit parameter
-        if limit < 1 or limit > 1000:
-            return "Error: limit must be between 1 and 1000"
+        if not 1 <= limit <= MAX_LIMIT:
+            return _LIMIT_ERROR
 
         # Escape SQL LIKE wildcards so they're treated as literal characters
         # Note: Parameterized queries prevent SQL injection; this is only for LIKE pattern matching
-        escaped_term = search_term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
-
-        with duckdb.connect(self.db_path) as conn:
-            result = conn.execute(
-                """
-                SELECT
-                    id,
-                    timestamp,
-                    query,
-                    execution_time_ms,
-                    row_count,
-                    success
-                FROM query_history
-                WHERE query ILIKE ? ESCAPE '\\'
-                ORDER BY id DESC
-                LIMIT ?
-            """,
-                [f"%{escaped_term}%", limit],
-            ).fetchdf()
-
-            if result.empty:
-                return f"No queries found matching '{search_term}'."
-
-            return result.to_markdown(index=False)
+        escaped_term = search_term.translate(_LIKE_ESCAPE_TABLE)
+
+        with self._reader() as cursor:
+            rows = cursor.execute(_SEARCH_SQL, [escaped_term, limit]).fetchall()
+            columns = [column[0] for column in cursor.description]
+
+        if not rows:
+            return f"No queries found matching '{search_term}'."
+
+        return _rows_to_markdown(columns, rows)
 
     def clear_history(self) -> str:
         """Clear all query history.
@@ -352,7 +484,11 @@ class HistoryDB:
         Returns:
             Success message with count of deleted queries
         """
-        with duckdb.connect(self.db_path) as conn:
+        self._ensure_schema()
+        with self._db_lock:
+            self._flush_pending()
+            self._secure_wal()
+            conn = self._conn
             # Use explicit transaction for atomicity
             conn.execute("BEGIN TRANSACTION")
             try:
@@ -360,43 +496,30 @@ class HistoryDB:
                 # More efficient than RETURNING which creates a result set for each deleted row
                 count = conn.execute("SELECT COUNT(*) FROM query_history").fetchone()[0]
 
-                # Delete all history
-                conn.execute("DELETE FROM query_history")
-
-                # Reset the sequence to start from 1 again
+                # Drop and recreate the table and sequence so IDs start from 1 again
                 # This prevents ID gaps and potential sequence exhaustion over time
-                # DuckDB doesn't support ALTER SEQUENCE RESTART, so we drop and recreate
-                conn.execute("DROP SEQUENCE IF EXISTS query_history_id_seq")
-                conn.execute("CREATE SEQUENCE query_history_id_seq START 1")
+                # DuckDB doesn't support ALTER SEQUENCE RESTART, and on an open connection
+                # the sequence can't be dropped while the table's default depends on it
+                conn.execute("DROP TABLE query_history")
+                conn.execute("DROP SEQUENCE query_history_id_seq")
+                self._create_schema()
 
                 conn.execute("COMMIT")
             except Exception:
                 conn.execute("ROLLBACK")
                 raise
 
-        # Thread-safe counter reset (outside DB transaction)
-        with self._counter_lock:
-            self._query_count = 0
+        # Counter reset (outside DB transaction); swapping the object is atomic
+        self._query_counter = itertools.count(1)
 
         return f"Cleared {count} queries from history."
 
 
-# Global instance with thread-safe initialization
-_history_db: Optional[HistoryDB] = None
-_lock = Lock()
-
-
+@lru_cache(maxsize=1)
 def get_history_db() -> HistoryDB:
     """Get or create the global history database instance.
 
-    Thread-safe singleton pattern using double-checked locking.
-
     Returns:
         HistoryDB: The global history database instance
     """
-    global _history_db
-    if _history_db is None:
-        with _lock:
-            if _history_db is None:
-                _history_db = HistoryDB()
-    return _history_db
+    return HistoryDB()
@@ -1,18 +1,75 @@
+from __future__ import annotations
+
 import sys
 import time
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
-import duckdb
+from tabulate import tabulate
 
 from core import WORKSPACE, get_workspace
 
 from . import mcp
-from .db import get_history_db
+from .db import _get_env_int, get_history_db
+
+if TYPE_CHECKING:
+    import duckdb
+
+# Identical SQL can return different rows once files or tables change, so caching
+# results is opt-in; 0 (the default) runs every query
+QUERY_CACHE_SIZE = _get_env_int("DATA_ANALYSIS_QUERY_CACHE_SIZE", 0, min_value=0, max_value=10000)
 
 # ======================================================
 # core
 # ======================================================
 
 
+@lru_cache(maxsize=1)
+def _get_query_db() -> duckdb.DuckDBPyConnection:
+    """Get the in-memory database shared by all queries; each call runs on its own cursor."""
+    import duckdb
+
+    return duckdb.connect(database=":memory:")
+
+
+def _execute_query(sql: str) -> tuple[str, int]:
+    """Run sql on the shared database and return its markdown table and row count."""
+    with _get_query_db().cursor() as cursor:
+        rows = cursor.execute(sql).fetchall()
+        columns = [column[0] for column in cursor.description]
+    # Render the tuples directly rather than through a DataFrame: skips the
+    # Arrow -> pandas conversion, and NULLs show as empty cells instead of <NA>/NaT
+    return tabulate(rows, headers=columns, tablefmt="pipe"), len(rows)
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _cached_query(sql: str) -> tuple[str, int]:
+    """_execute_query memoized by SQL text; only ever called with read-only SQL."""
+    return _execute_query(sql)
+
+
+def _is_read_only(sql: str) -> bool:
+    """Whether every statement in sql is a SELECT (unparsable SQL counts as not read-only)."""
+    import duckdb
+
+    try:
+        statements = _get_query_db().extract_statements(sql)
+    except duckdb.Error:
+        return False
+    return bool(statements) and all(s.type == duckdb.StatementType.SELECT for s in statements)
+
+
+def _run_query(sql: str) -> tuple[str, int]:
+    """Run sql, answering repeated read-only queries from the cache when it is enabled."""
+    if not QUERY_CACHE_SIZE:
+        return _execute_query(sql)
+    if _is_read_only(sql):
+        return _cached_query(sql)
+    # Writes and DDL always run, and may change what any cached SELECT would return
+    _cached_query.cache_clear()
+    return _execute_query(sql)
+
+
 @mcp.tool()
 def get_workspace_path() -> str:
     """Get the workspace directory path for saving files.
@@ -27,28 +84,24 @@ def get_workspace_path() -> str:
 def query(sql: str) -> str:
     """execute a duckdb sql query and return the result as text."""
     history_db = get_history_db()
-    start_time = time.time()
+    start_time = time.perf_counter_ns()
 
     try:
-        with duckdb.connect(database=":memory:") as db:
-            result_df = db.execute(sql).fetchdf()
-            execution_time_ms = (time.time() - start_time) * 1000
-
-            result_text = result_df.to_markdown(index=False)
-            row_count = len(result_df)
-
-            # Log successful query
-            history_db.log_query(
-                query=sql,
-                result=result_text,
-                execution_time_ms=execution_time_ms,
-                row_count=row_count,
-                success=True,
-            )
-
-            return result_text
+        result_text, row_count = _run_query(sql)
+        execution_time_ms = (time.perf_counter_ns() - start_time) / 1_000_000
+
+        # Log successful query (cache hits included)
+        history_db.log_query(
+            query=sql,
+            result=result_text,
+            execution_time_ms=execution_time_ms,
+            row_count=row_count,
+            success=True,
+        )
+
+        return result_text
     except Exception as e:
-        execution_time_ms = (time.time() - start_time) * 1000
+        execution_time_ms = (time.perf_counter_ns() - start_time) / 1_000_000
         error_msg = str(e)
 
         # Log failed query, but don't mask the original error if logging fails
@@ -4,30 +4,55 @@ import tempfile
 from pathlib import Path
 
 import pytest
+import pytest_asyncio
+from fastmcp import Client
+
+
+def pytest_addoption(parser):
+    parser.addoption("--run-slow", action="store_true", default=False, help="run tests marked slow")
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip tests marked slow unless --run-slow is given."""
+    if config.getoption("--run-slow"):
+        return
+    skip_slow = pytest.mark.skip(reason="needs --run-slow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
 
 
 @pytest.fixture(autouse=True)
-def reset_history_db():
+def reset_history_db(monkeypatch):
     """Reset global database between tests for isolation.
 
     This fixture ensures each test has its own isolated database
     to prevent test interference and flaky tests.
     """
     import data_analysis.db as db_module
-
-    # Store original database instance
-    original_db = db_module._history_db
+    import data_analysis.tools as tools_module
 
     # Create temporary directory for test database
     with tempfile.TemporaryDirectory() as tmpdir:
-        # Reset global database to use temp directory
-        with db_module._lock:
-            db_module._history_db = db_module.HistoryDB(db_path=str(Path(tmpdir) / "test.db"))
+        # Point the tools at a database in the temp directory instead of the cached global one
+        test_db = db_module.HistoryDB(db_path=str(Path(tmpdir) / "test.db"))
+        monkeypatch.setattr(tools_module, "get_history_db", lambda: test_db)
 
         try:
             yield
         finally:
-            # Restore original database before tempdir is deleted
-            # This prevents _history_db from pointing to a deleted directory
-            with db_module._lock:
-                db_module._history_db = original_db
+            # Close before the tempdir is deleted
+            test_db.close()
+
+
+@pytest_asyncio.fixture(scope="session")
+async def client():
+    """One in-process client shared by the whole session.
+
+    Tools look up the history database at call time, so the per-test database
+    from reset_history_db still applies to every call made through it.
+    """
+    from data_analysis.tools import mcp
+
+    async with Client(mcp) as session_client:
+        yield session_client
@@ -0,0 +1,218 @@
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from data_analysis import db as db_module
+from data_analysis.db import HistoryDB, _get_env_int, _rows_to_markdown
+
+
+def test_close_flushes_buffered_queries(tmp_path):
+    """Queries still buffered in memory should be persisted on close."""
+    db_path = str(tmp_path / "history.db")
+    db = HistoryDB(db_path=db_path)
+    db.log_query("SELECT 42", result="| 42 |", row_count=1)
+    db.close()
+
+    reopened = HistoryDB(db_path=db_path)
+    try:
+        assert reopened.get_query_result(1) == "| 42 |"
+    finally:
+        reopened.close()
+
+
+def test_full_batch_written_by_background_writer(tmp_path, monkeypatch):
+    """A full batch should reach the database without a read or flush by the caller."""
+    monkeypatch.setattr(db_module, "FLUSH_BATCH_SIZE", 2)
+    db = HistoryDB(db_path=str(tmp_path / "history.db"))
+    try:
+        db.log_query("SELECT 1")
+        db.log_query("SELECT 2")
+
+        deadline = time.monotonic() + 5
+        while db._pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        with db._db_lock:
+            count = db._conn.execute("SELECT COUNT(*) FROM query_history").fetchone()[0]
+        assert count == 2
+    finally:
+        db.close()
+
+
+def test_large_result_truncated_at_line_boundary(tmp_path, monkeypatch):
+    """Oversized results should be cut after the last whole line within the limit."""
+    monkeypatch.setattr(db_module, "MAX_RESULT_SIZE", 10)
+    db = HistoryDB(db_path=str(tmp_path / "history.db"))
+    try:
+        db.log_query("SELECT big", result="| 1 |\n| 2 |\n| 3 |")
+        assert db.get_query_result(1) == "| 1 |\n\n... (result truncated due to size limit)"
+    finally:
+        db.close()
+
+
+def test_schema_created_on_first_use(tmp_path):
+    """Creating the instance should not run schema DDL until the history is used."""
+    db = HistoryDB(db_path=str(tmp_path / "history.db"))
+    try:
+        tables = "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'query_history'"
+        assert db._conn.execute(tables).fetchone()[0] == 0
+
+        assert db.get_history() == "No query history found."
+        assert db._conn.execute(tables).fetchone()[0] == 1
+    finally:
+        db.close()
+
+
+def test_get_env_int(monkeypatch):
+    """Unset, non-numeric and out-of-range values should fall back to the default."""
+    monkeypatch.delenv("DATA_ANALYSIS_TEST_INT", raising=False)
+    assert _get_env_int("DATA_ANALYSIS_TEST_INT", 5, min_value=1, max_value=10) == 5
+
+    monkeypatch.setenv("DATA_ANALYSIS_TEST_INT", "7")
+    assert _get_env_int("DATA_ANALYSIS_TEST_INT", 5, min_value=1, max_value=10) == 7
+
+    for invalid in ("abc", "0", "11"):
+        monkeypatch.setenv("DATA_ANALYSIS_TEST_INT", invalid)
+        assert _get_env_int("DATA_ANALYSIS_TEST_INT", 5, min_value=1, max_value=10) == 5
+
+
+def test_search_treats_like_wildcards_literally(tmp_path):
+    """% and _ in a search term should only match themselves."""
+    db = HistoryDB(db_path=str(tmp_path / "history.db"))
+    try:
+        db.log_query("SELECT 'a_b%'")
+        db.log_query("SELECT 'axbyz'")
+
+        table = db.search_history("a_b%")
+        assert "a_b%" in table
+        assert "axbyz" not in table
+    finally:
+        db.close()
+
+
+def test_query_text_index_dropped(tmp_path):
+    """An index on query text left by older versions should be dropped on first use."""
+    db_path = str(tmp_path / "history.db")
+    db = HistoryDB(db_path=db_path)
+    db.get_history()
+    with db._db_lock:
+        db._conn.execute("CREATE INDEX idx_query_history_query ON query_history(query)")
+    db.close()
+
+    db = HistoryDB(db_path=db_path)
+    try:
+        db.get_history()
+        indexes = "SELECT COUNT(*) FROM duckdb_indexes() WHERE index_name = 'idx_query_history_query'"
+        assert db._conn.execute(indexes).fetchone()[0] == 0
+    finally:
+        db.close()
+
+
+def test_wal_is_owner_only(tmp_path):
+    """The WAL holds logged results too, so it must be as private as the database file."""
+    db_path = tmp_path / "history.db"
+    db = HistoryDB(db_path=str(db_path))
+    try:
+        for i in range(3):
+            db.log_query(f"SELECT {i}", result=str(i))
+            db.flush()
+            with db._db_lock:
+                db._conn.execute("CHECKPOINT")  # Deletes the WAL; the next write must not recreate it 0644
+        db.log_query("SELECT 'after checkpoint'", result="secret")
+        db.flush()
+
+        wal_path = tmp_path / "history.db.wal"
+        assert wal_path.stat().st_size > 0
+        assert wal_path.stat().st_mode & 0o077 == 0
+    finally:
+        db.close()
+
+
+def test_rows_to_markdown():
+    """Rows should render as a pipe table with empty cells for NULLs."""
+    table = _rows_to_markdown(["id", "error"], [(2, None), (1, "boom")])
+    assert table.splitlines() == [
+        "|   id | error   |",
+        "|-----:|:--------|",
+        "|    2 |         |",
+        "|    1 | boom    |",
+    ]
+
+
+def test_history_renders_multiline_query(tmp_path):
+    """A multi-line query should keep the table shape DataFrame.to_markdown() produced."""
+    db = HistoryDB(db_path=str(tmp_path / "history.db"))
+    try:
+        db.log_query("SELECT 1\nFROM t", result="1", execution_time_ms=5)
+        rows = db.get_history(limit=1).splitlines()
+    finally:
+        db.close()
+
+    cells = [[cell.strip() for cell in row.split("|")[1:-1]] for row in rows]
+    assert cells[0] == ["id", "timestamp", "query", "execution_time_ms", "row_count", "success"]
+    assert cells[2][0] == "1" and cells[2][2] == "SELECT 1" and cells[2][5] == "True"
+    # The second line wraps into a continuation row instead of breaking the table
+    assert cells[3] == ["", "", "FROM t", "", "", ""]
+    assert len({len(row) for row in rows}) == 1
+
+
+def test_connection_tuned_for_small_writes(tmp_path):
+    """The history connection should be single-threaded and unordered on insert."""
+    db = HistoryDB(db_path=str(tmp_path / "history.db"))
+    try:
+        assert db._conn.execute("SELECT current_setting('threads')").fetchone()[0] == 1
+        assert db._conn.execute("SELECT current_setting('preserve_insertion_order')").fetchone()[0] is False
+        # Checkpointing keeps its default so the WAL doesn't grow for the whole session
+        assert db._conn.execute("SELECT current_setting('checkpoint_threshold')").fetchone()[0] != "1GB"
+    finally:
+        db.close()
+
+
+def test_concurrent_readers_see_logged_queries(tmp_path):
+    """Reads from several threads should each see every logged query."""
+    db = HistoryDB(db_path=str(tmp_path / "history.db"))
+    try:
+        for i in range(5):
+            db.log_query(f"SELECT {i}", result=str(i), row_count=1)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(db.get_query_result, range(1, 6)))
+
+        assert results == ["0", "1", "2", "3", "4"]
+    finally:
+        db.close()
+
+
+def test_history_db_import_does_not_load_pandas():
+    """Importing the history module should not pull pandas into the process."""
+    script = "import sys, data_analysis.db; assert 'pandas' not in sys.modules, 'pandas was imported'"
+    src_dir = Path(__file__).resolve().parents[1] / "src"
+    result = subprocess.run([sys.executable, "-c", script], cwd=src_dir, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_package_import_does_not_load_duckdb():
+    """Importing the server package should defer DuckDB until a database is opened."""
+    script = "import sys, data_analysis; assert 'duckdb' not in sys.modules, 'duckdb was imported'"
+    src_dir = Path(__file__).resolve().parents[1] / "src"
+    result = subprocess.run([sys.executable, "-c", script], cwd=src_dir, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_buffered_queries_flushed_at_exit(tmp_path):
+    """A partial batch should be written when the process exits without close()."""
+    db_path = str(tmp_path / "history.db")
+    script = (
+        f"from data_analysis.db import HistoryDB; HistoryDB(db_path={db_path!r}).log_query('SELECT 1', result='one')"
+    )
+    src_dir = Path(__file__).resolve().parents[1] / "src"
+    result = subprocess.run([sys.executable, "-c", script], cwd=src_dir, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+    db = HistoryDB(db_path=db_path)
+    try:
+        assert db.get_query_result(1) == "one"
+    finally:
+        db.close()
@@ -2,397 +2,388 @@ import asyncio
 import re
 
 import pytest
-from fastmcp import Client
 
-from data_analysis.tools import mcp
+# First integer cell of a markdown table row: the query ID in history output
+_ID_RE = re.compile(r"\|\s*(\d+)\s*\|")
+# Whole data rows of a history table (header and separator rows don't start with an ID)
+_DATA_ROW_RE = re.compile(r"^\|\s*\d+\s*\|.*$", re.M)
 
+MAX_IN_FLIGHT = 16  # Concurrent tool calls allowed by _run_concurrently
 
-@pytest.mark.asyncio
-async def test_get_workspace_path():
+
+async def _run_concurrently(client, queries: list[str]):
+    """Run queries concurrently, keeping at most MAX_IN_FLIGHT calls in flight."""
+    semaphore = asyncio.Semaphore(MAX_IN_FLIGHT)
+
+    async def run(sql: str):
+        async with semaphore:
+            return await client.call_tool("query", {"sql": sql})
+
+    # TaskGroup cancels the remaining calls as soon as one fails
+    async with asyncio.TaskGroup() as group:
+        tasks = [group.create_task(run(sql)) for sql in queries]
+    return [task.result() for task in tasks]
+
+
+async def _last_query_id(client) -> int:
+    """Return the ID of the most recently logged query."""
+    history_res = await client.call_tool("get_query_history", {"limit": 1})
+    match = _ID_RE.search(history_res.content[0].text)
+    assert match is not None, "Could not find query ID in history"
+    return int(match.group(1))
+
+
+async def test_get_workspace_path(client):
     """Test get_workspace_path returns correct path."""
-    async with Client(mcp) as client:
-        res = await client.call_tool("get_workspace_path", {})
-        path = res.content[0].text
-        assert ".mcp-servers/workspace" in path
+    res = await client.call_tool("get_workspace_path", {})
+    path = res.content[0].text
+    assert ".mcp-servers/workspace" in path
 
 
-@pytest.mark.asyncio
-async def test_add():
-    async with Client(mcp) as client:
-        res = await client.call_tool("add", {"a": 1, "b": 2})
-        assert res.content[0].text == "3"
+async def test_add(client):
+    res = await client.call_tool("add", {"a": 1, "b": 2})
+    assert res.content[0].text == "3"
 
 
-@pytest.mark.asyncio
-async def test_sub():
-    async with Client(mcp) as client:
-        res = await client.call_tool("sub", {"a": 2, "b": 1})
-        assert res.content[0].text == "1"
+async def test_sub(client):
+    res = await client.call_tool("sub", {"a": 2, "b": 1})
+    assert res.content[0].text == "1"
 
 
-@pytest.mark.asyncio
-async def test_mul():
-    async with Client(mcp) as client:
-        res = await client.call_tool("mul", {"a": 2, "b": 3})
-        assert res.content[0].text == "6"
+async def test_mul(client):
+    res = await client.call_tool("mul", {"a": 2, "b": 3})
+    assert res.content[0].text == "6"
 
 
-@pytest.mark.asyncio
-async def test_div():
-    async with Client(mcp) as client:
-        res = await client.call_tool("div", {"a": 2, "b": 1})
-        assert res.content[0].text == "2.0"
+async def test_div(client):
+    res = await client.call_tool("div", {"a": 2, "b": 1})
+    assert res.content[0].text == "2.0"
 
 
-@pytest.mark.asyncio
-async def test_query():
-    async with Client(mcp) as client:
-        res = await client.call_tool("query", {"sql": "SELECT 1 as test"})
-        assert "test" in res.content[0].text
+async def test_query(client):
+    res = await client.call_tool("query", {"sql": "SELECT 1 as test"})
+    assert "test" in res.content[0].text
 
 
-@pytest.mark.asyncio
-async def test_query_history_logging():
+async def test_query_history_logging(client):
     """Test that queries are logged to history."""
-    async with Client(mcp) as client:
-        # Execute a query
-        await client.call_tool("query", {"sql": "SELECT 42 as answer"})
+    # Execute a query
+    await client.call_tool("query", {"sql": "SELECT 42 as answer"})
 
-        # Get history
-        history_res = await client.call_tool("get_query_history", {"limit": 5})
-        history_text = history_res.content[0].text
+    # Get history
+    history_res = await client.call_tool("get_query_history", {"limit": 5})
+    history_text = history_res.content[0].text
 
-        # Verify query appears in history
-        assert "SELECT 42 as answer" in history_text
-        assert "answer" in history_text or "42" in history_text
+    # Verify query appears in history
+    assert "SELECT 42 as answer" in history_text
+    assert "answer" in history_text or "42" in history_text
 
 
-@pytest.mark.asyncio
-async def test_query_history_failed_query():
+async def test_query_history_failed_query(client):
     """Test that failed queries are logged with error messages."""
-    async with Client(mcp) as client:
-        # Execute an invalid query
-        try:
-            await client.call_tool("query", {"sql": "SELECT * FROM nonexistent_table"})
-        except Exception:
-            pass  # Expected to fail
+    # Execute an invalid query
+    try:
+        await client.call_tool("query", {"sql": "SELECT * FROM nonexistent_table"})
+    except Exception:
+        pass  # Expected to fail
 
-        # Get history
-        history_res = await client.call_tool("get_query_history", {"limit": 5})
-        history_text = history_res.content[0].text
+    # Get history
+    history_res = await client.call_tool("get_query_history", {"limit": 5})
+    history_text = history_res.content[0].text
 
-        # Verify failed query appears in history
-        assert "nonexistent_table" in history_text
+    # Verify failed query appears in history
+    assert "nonexistent_table" in history_text
 
 
-@pytest.mark.asyncio
-async def test_get_cached_result():
+async def test_get_cached_result(client):
     """Test retrieving cached results from previous queries."""
-    async with Client(mcp) as client:
-        # Execute a query
-        await client.call_tool("query", {"sql": "SELECT 'cached' as test_value"})
+    # Execute a query
+    await client.call_tool("query", {"sql": "SELECT 'cached' as test_value"})
 
-        # Get history to find the query ID
-        history_res = await client.call_tool("get_query_history", {"limit": 1})
-        history_text = history_res.content[0].text
+    query_id = await _last_query_id(client)
 
-        # Extract query ID from history (first number after "id")
-        match = re.search(r"\|\s*(\d+)\s*\|", history_text)
-        assert match is not None, "Could not find query ID in history"
-        query_id = int(match.group(1))
+    # Get cached result
+    cached_res = await client.call_tool("get_cached_result", {"query_id": query_id})
+    cached_text = cached_res.content[0].text
 
-        # Get cached result
-        cached_res = await client.call_tool("get_cached_result", {"query_id": query_id})
-        cached_text = cached_res.content[0].text
+    # Verify cached result contains our value
+    assert "cached" in cached_text or "test_value" in cached_text
 
-        # Verify cached result contains our value
-        assert "cached" in cached_text or "test_value" in cached_text
 
-
-@pytest.mark.asyncio
-async def test_search_query_history():
+async def test_search_query_history(client):
     """Test searching query history."""
-    async with Client(mcp) as client:
-        # Execute a few queries with distinct patterns
-        await client.call_tool("query", {"sql": "SELECT 'findme' as unique_search_term"})
-        await client.call_tool("query", {"sql": "SELECT 1 as other_query"})
+    # Execute a few queries with distinct patterns
+    await client.call_tool("query", {"sql": "SELECT 'findme' as unique_search_term"})
+    await client.call_tool("query", {"sql": "SELECT 1 as other_query"})
 
-        # Search for the specific query
-        search_res = await client.call_tool("search_query_history", {"search_term": "findme", "limit": 5})
-        search_text = search_res.content[0].text
+    # Search for the specific query
+    search_res = await client.call_tool("search_query_history", {"search_term": "findme", "limit": 5})
+    search_text = search_res.content[0].text
 
-        # Verify search finds the right query
-        assert "findme" in search_text
-        assert "unique_search_term" in search_text
+    # Verify search finds the right query
+    assert "findme" in search_text
+    assert "unique_search_term" in search_text
 
 
-@pytest.mark.asyncio
-async def test_query_history_limit():
+async def test_query_history_limit(client):
     """Test that query history respects the limit parameter."""
-    async with Client(mcp) as client:
-        # Get history with limit of 1
-        history_res = await client.call_tool("get_query_history", {"limit": 1})
-        history_text = history_res.content[0].text
-
-        # Count the number of query rows (rough check - each query has at least one pipe)
-        # This is a basic test - proper implementation would parse markdown properly
-        lines = [line for line in history_text.split("\n") if "|" in line and "id" not in line.lower()]
+    # Get history with limit of 1
+    history_res = await client.call_tool("get_query_history", {"limit": 1})
+    history_text = history_res.content[0].text
 
-        # Should have at most 1 data row (plus header and separator)
-        assert len(lines) <= 3  # header + separator + 1 data row
+    # Should have at most 1 data row
+    lines = _DATA_ROW_RE.findall(history_text)
+    assert len(lines) <= 1
 
 
-@pytest.mark.asyncio
-async def test_invalid_query_id():
+async def test_invalid_query_id(client):
     """Test retrieving cached result with invalid query ID."""
-    async with Client(mcp) as client:
-        # Try to get result for non-existent query ID
-        cached_res = await client.call_tool("get_cached_result", {"query_id": 99999})
-        cached_text = cached_res.content[0].text
+    # Try to get result for non-existent query ID
+    cached_res = await client.call_tool("get_cached_result", {"query_id": 99999})
+    cached_text = cached_res.content[0].text
 
-        # Should return appropriate error message
-        assert "not found" in cached_text.lower()
+    # Should return appropriate error message
+    assert cached_text == "Query ID 99999 not found in history."
 
 
-@pytest.mark.asyncio
-async def test_search_no_results():
+async def test_search_no_results(client):
     """Test searching with term that matches no queries."""
-    async with Client(mcp) as client:
-        # Search for something that doesn't exist
-        search_res = await client.call_tool(
-            "search_query_history", {"search_term": "nonexistent_query_xyz123", "limit": 5}
-        )
-        search_text = search_res.content[0].text
+    # Search for something that doesn't exist
+    search_res = await client.call_tool("search_query_history", {"search_term": "nonexistent_query_xyz123", "limit": 5})
+    search_text = search_res.content[0].text
 
-        # Should indicate no results found
-        assert "no queries found" in search_text.lower() or "nonexistent_query_xyz123" in search_text
+    # Should indicate no results found
+    assert search_text == "No queries found matching 'nonexistent_query_xyz123'."
 
 
-@pytest.mark.asyncio
-async def test_clear_history():
+async def test_clear_history(client):
     """Test clearing all query history."""
-    async with Client(mcp) as client:
-        # Execute a query to ensure there's something in history
-        await client.call_tool("query", {"sql": "SELECT 'to_be_cleared' as test"})
+    # Execute a query to ensure there's something in history
+    await client.call_tool("query", {"sql": "SELECT 'to_be_cleared' as test"})
 
-        # Clear history
-        clear_res = await client.call_tool("clear_query_history", {})
-        clear_text = clear_res.content[0].text
+    # Clear history
+    clear_res = await client.call_tool("clear_query_history", {})
+    clear_text = clear_res.content[0].text
 
-        # Should confirm deletion
-        assert "cleared" in clear_text.lower()
+    # Should confirm deletion
+    assert clear_text == "Cleared 1 queries from history."
 
-        # Verify history is empty
-        history_res = await client.call_tool("get_query_history", {"limit": 10})
-        history_text = history_res.content[0].text
+    # Verify history is empty
+    history_res = await client.call_tool("get_query_history", {"limit": 10})
+    history_text = history_res.content[0].text
 
-        assert "no query history" in history_text.lower() or history_text.strip() == ""
+    assert history_text == "No query history found."
 
 
-@pytest.mark.asyncio
-async def test_concurrent_query_logging():
+async def test_concurrent_query_logging(client):
     """Test that concurrent queries are logged correctly without race conditions."""
-    async with Client(mcp) as client:
-        # Execute multiple queries concurrently
-        queries = [f"SELECT {i} as concurrent_test_{i}" for i in range(20)]
+    # Execute multiple queries concurrently
+    queries = [f"SELECT {i} as concurrent_test_{i}" for i in range(20)]
 
-        # Run all queries concurrently
-        tasks = [client.call_tool("query", {"sql": sql}) for sql in queries]
-        await asyncio.gather(*tasks)
+    # Run all queries concurrently
+    await _run_concurrently(client, queries)
 
-        # Get history
-        history_res = await client.call_tool("get_query_history", {"limit": 25})
-        history_text = history_res.content[0].text
+    # Get history
+    history_res = await client.call_tool("get_query_history", {"limit": 25})
+    history_text = history_res.content[0].text
 
-        # Verify that all queries were logged
-        # At least some of the concurrent queries should appear in history
-        concurrent_count = sum(1 for i in range(20) if f"concurrent_test_{i}" in history_text)
+    # Verify that all queries were logged
+    # At least some of the concurrent queries should appear in history
+    concurrent_count = len({int(i) for i in re.findall(r"concurrent_test_(\d+)", history_text) if int(i) < 20})
 
-        # Should have logged almost all queries. Threshold is 18/20 (90%) to properly detect race conditions.
-        # With proper thread safety and locking, we should consistently log 18-20 out of 20 queries.
-        # If this test fails consistently, it indicates a real race condition issue that needs fixing.
-        # Note: Cleanup may remove some queries if triggered during test (every 10 queries)
-        assert concurrent_count >= 18, (
-            f"Only {concurrent_count}/20 concurrent queries were logged - possible race condition"
-        )
+    # Should have logged almost all queries. Threshold is 18/20 (90%) to properly detect race conditions.
+    # With proper thread safety and locking, we should consistently log 18-20 out of 20 queries.
+    # If this test fails consistently, it indicates a real race condition issue that needs fixing.
+    # Note: Cleanup may remove some queries if triggered during test (every 10 queries)
+    assert concurrent_count >= 18, (
+        f"Only {concurrent_count}/20 concurrent queries were logged - possible race condition"
+    )
 
 
-@pytest.mark.asyncio
-async def test_auto_cleanup():
+async def test_auto_cleanup(client):
     """Test that history maintains max size through auto-cleanup."""
-    async with Client(mcp) as client:
-        # Execute more queries than MAX_HISTORY_SIZE to trigger cleanup
-        # We'll do 110 queries which should trigger cleanup at least once
-        for i in range(110):
-            await client.call_tool("query", {"sql": f"SELECT {i} as cleanup_test_{i}"})
-
-        # Get all history (request more than we should have)
-        history_res = await client.call_tool("get_query_history", {"limit": 200})
-        history_text = history_res.content[0].text
-
-        # Count data rows in markdown table (exclude header and separator)
-        lines = [
-            line
-            for line in history_text.split("\n")
-            if "|" in line and "id" not in line.lower() and not line.startswith("|--")
-        ]
-
-        # Should have approximately MAX_HISTORY_SIZE rows (100)
-        # Allow some margin due to cleanup frequency (runs every 10 queries)
-        assert len(lines) <= 105, f"Expected ~100 rows, got {len(lines)}"
-        assert len(lines) >= 95, f"Expected ~100 rows, got {len(lines)}"
-
-
-@pytest.mark.asyncio
-async def test_large_result_truncation():
-    """Test that large results (>1MB) are truncated."""
-    async with Client(mcp) as client:
-        # Create a large result (>1MB)
-        # Each repeat creates 100,000 characters, 20 rows = 2,000,000 characters > 1MB
-        large_query = "SELECT repeat('x', 100000) as big_col FROM range(20)"
-
-        # Execute the query - should succeed
-        result_res = await client.call_tool("query", {"sql": large_query})
-        result_text = result_res.content[0].text
+    # Execute more queries than MAX_HISTORY_SIZE to trigger cleanup
+    # We'll do 110 queries which should trigger cleanup at least once
+    await _run_concurrently(client, [f"SELECT {i} as cleanup_test_{i}" for i in range(110)])
 
-        # Verify query executed successfully
-        assert result_text is not None
-        assert len(result_text) > 0
+    # Get all history (request more than we should have)
+    history_res = await client.call_tool("get_query_history", {"limit": 200})
+    history_text = history_res.content[0].text
 
-        # Get history to find the query ID
-        history_res = await client.call_tool("get_query_history", {"limit": 1})
-        history_text = history_res.content[0].text
+    # Count data rows in markdown table (exclude header and separator)
+    lines = _DATA_ROW_RE.findall(history_text)
 
-        # Extract query ID
-        match = re.search(r"\|\s*(\d+)\s*\|", history_text)
-        assert match is not None, "Could not find query ID in history"
-        query_id = int(match.group(1))
+    # Should have approximately MAX_HISTORY_SIZE rows (100)
+    # Allow some margin due to cleanup frequency (runs every 10 queries)
+    assert len(lines) <= 105, f"Expected ~100 rows, got {len(lines)}"
+    assert len(lines) >= 95, f"Expected ~100 rows, got {len(lines)}"
 
-        # Get cached result
-        cached_res = await client.call_tool("get_cached_result", {"query_id": query_id})
-        cached_text = cached_res.content[0].text
 
-        # Should contain truncation marker
-        assert "truncated" in cached_text.lower(), "Large result should be truncated"
+@pytest.mark.slow
+async def test_large_result_truncation(client):
+    """Test that large results (>1MB) are truncated."""
+    # Create a large result (>1MB)
+    # Each repeat creates 100,000 characters, 20 rows = 2,000,000 characters > 1MB
+    large_query = "SELECT repeat('x', 100000) as big_col FROM range(20)"
+
+    # Execute the query - should succeed
+    result_res = await client.call_tool("query", {"sql": large_query})
+    result_text = result_res.content[0].text
+
+    # Verify query executed successfully
+    assert result_text is not None
+    assert len(result_text) > 0
+
+    query_id = await _last_query_id(client)
+
+    # Get cached result
+    cached_res = await client.call_tool("get_cached_result", {"query_id": query_id})
+    cached_text = cached_res.content[0].text
+
+    # Should contain truncation marker
+    assert cached_text.endswith("\n\n... (result truncated due to size limit)"), "Large result should be truncated"
+
+    # Verify the cached result is actually truncated (< 1.1MB to allow for formatting)
+    assert len(cached_text) < 1.1 * 1024 * 1024, "Cached result should be under 1.1MB"
+
+
+@pytest.mark.parametrize(
+    "limit, expect_error",
+    [
+        (-1, True),  # negative
+        (0, True),  # zero
+        (2000, True),  # excessively large
+        (1, False),
+        (1000, False),
+    ],
+)
+async def test_limit_validation(client, limit, expect_error):
+    """Test that limit parameters are validated."""
+    history_res = await client.call_tool("get_query_history", {"limit": limit})
+    history_text = history_res.content[0].text
+    if expect_error:
+        assert history_text == "Error: limit must be between 1 and 1000"
+    else:
+        assert not history_text.startswith("Error:")
 
-        # Verify the cached result is actually truncated (< 1.1MB to allow for formatting)
-        assert len(cached_text) < 1.1 * 1024 * 1024, "Cached result should be under 1.1MB"
 
+async def test_concurrent_cleanup(client):
+    """Test that concurrent cleanup operations don't cause race conditions."""
+    # Execute enough concurrent queries to trigger cleanup multiple times
+    # With cleanup frequency of 10, this should trigger ~12 cleanup attempts
+    queries = [f"SELECT {i} as concurrent_cleanup_{i}" for i in range(120)]
 
-@pytest.mark.asyncio
-async def test_limit_validation():
-    """Test that limit parameters are validated."""
-    async with Client(mcp) as client:
-        # Test negative limit
-        history_res = await client.call_tool("get_query_history", {"limit": -1})
-        assert "error" in history_res.content[0].text.lower()
+    # Run all queries concurrently - some will trigger cleanup
+    await _run_concurrently(client, queries)
 
-        # Test zero limit
-        history_res = await client.call_tool("get_query_history", {"limit": 0})
-        assert "error" in history_res.content[0].text.lower()
+    # Get history to verify cleanup worked correctly
+    history_res = await client.call_tool("get_query_history", {"limit": 200})
+    history_text = history_res.content[0].text
 
-        # Test excessively large limit
-        history_res = await client.call_tool("get_query_history", {"limit": 2000})
-        assert "error" in history_res.content[0].text.lower()
+    # Count data rows
+    lines = _DATA_ROW_RE.findall(history_text)
 
-        # Test valid limits
-        history_res = await client.call_tool("get_query_history", {"limit": 1})
-        assert "error" not in history_res.content[0].text.lower()
+    # Should maintain approximately MAX_HISTORY_SIZE despite concurrent cleanups
+    # Allow some margin due to cleanup frequency
+    assert len(lines) <= 105, f"Expected ~100 rows after concurrent cleanup, got {len(lines)}"
+    assert len(lines) >= 95, f"Expected ~100 rows after concurrent cleanup, got {len(lines)}"
 
-        history_res = await client.call_tool("get_query_history", {"limit": 1000})
-        assert "error" not in history_res.content[0].text.lower()
+    # Verify no duplicate or corrupted entries: IDs should be unique, so stop at the first repeat
+    seen = set()
+    for line in lines:
+        if match := _ID_RE.search(line):
+            query_id = int(match.group(1))
+            assert query_id not in seen, f"Found duplicate ID {query_id} - possible race condition"
+            seen.add(query_id)
 
 
-@pytest.mark.asyncio
-async def test_concurrent_cleanup():
-    """Test that concurrent cleanup operations don't cause race conditions."""
-    async with Client(mcp) as client:
-        # Clear history first to start fresh
-        await client.call_tool("clear_query_history", {})
-
-        # Execute enough concurrent queries to trigger cleanup multiple times
-        # With cleanup frequency of 10, this should trigger ~12 cleanup attempts
-        queries = [f"SELECT {i} as concurrent_cleanup_{i}" for i in range(120)]
-
-        # Run all queries concurrently - some will trigger cleanup
-        tasks = [client.call_tool("query", {"sql": sql}) for sql in queries]
-        await asyncio.gather(*tasks)
-
-        # Get history to verify cleanup worked correctly
-        history_res = await client.call_tool("get_query_history", {"limit": 200})
-        history_text = history_res.content[0].text
-
-        # Count data rows
-        lines = [
-            line
-            for line in history_text.split("\n")
-            if "|" in line and "id" not in line.lower() and not line.startswith("|--")
-        ]
-
-        # Should maintain approximately MAX_HISTORY_SIZE despite concurrent cleanups
-        # Allow some margin due to cleanup frequency
-        assert len(lines) <= 105, f"Expected ~100 rows after concurrent cleanup, got {len(lines)}"
-        assert len(lines) >= 95, f"Expected ~100 rows after concurrent cleanup, got {len(lines)}"
-
-        # Verify no duplicate or corrupted entries by checking IDs are sequential
-        ids = []
-        for line in lines:
-            match = re.search(r"\|\s*(\d+)\s*\|", line)
-            if match:
-                ids.append(int(match.group(1)))
-
-        # IDs should be unique (no duplicates)
-        assert len(ids) == len(set(ids)), "Found duplicate IDs - possible race condition"
-
-
-@pytest.mark.asyncio
-async def test_search_with_special_characters():
+async def test_search_with_special_characters(client):
     """Test searching with SQL LIKE wildcards is properly escaped."""
-    async with Client(mcp) as client:
-        # Execute queries with special characters
-        await client.call_tool("query", {"sql": "SELECT 'test%data' as col1"})
-        await client.call_tool("query", {"sql": "SELECT 'test_data' as col2"})
-        await client.call_tool("query", {"sql": "SELECT 'testdata' as col3"})
+    # Execute queries with special characters
+    await client.call_tool("query", {"sql": "SELECT 'test%data' as col1"})
+    await client.call_tool("query", {"sql": "SELECT 'test_data' as col2"})
+    await client.call_tool("query", {"sql": "SELECT 'testdata' as col3"})
 
-        # Search for literal '%' - should only find first query
-        search_res = await client.call_tool("search_query_history", {"search_term": "test%data", "limit": 5})
-        search_text = search_res.content[0].text
+    # Search for literal '%' - should only find first query
+    search_res = await client.call_tool("search_query_history", {"search_term": "test%data", "limit": 5})
+    search_text = search_res.content[0].text
 
-        # Should find the query with literal '%'
-        assert "test%data" in search_text
-        # Should NOT match 'testdata' (% as wildcard would match this)
-        # This verifies that % is properly escaped
+    # Should find the query with literal '%'
+    assert "test%data" in search_text
+    # Should NOT match 'testdata' (% as wildcard would match this)
+    # This verifies that % is properly escaped
 
 
-@pytest.mark.asyncio
-async def test_error_message_sanitization():
+async def test_error_message_sanitization(client):
     """Test that error messages are sanitized to prevent information leakage."""
-    async with Client(mcp) as client:
-        # Execute a query that will fail with detailed error
-        try:
-            await client.call_tool("query", {"sql": "SELECT * FROM nonexistent_table"})
-        except Exception:
-            pass  # Expected to fail
-
-        # Get history to find the query ID
-        history_res = await client.call_tool("get_query_history", {"limit": 1})
-        history_text = history_res.content[0].text
-
-        # Extract query ID
-        match = re.search(r"\|\s*(\d+)\s*\|", history_text)
-        assert match is not None, "Could not find query ID in history"
-        query_id = int(match.group(1))
-
-        # Get the cached error result
-        cached_res = await client.call_tool("get_cached_result", {"query_id": query_id})
-        cached_text = cached_res.content[0].text
-
-        # Verify error is returned
-        assert "failed" in cached_text.lower() or "error" in cached_text.lower()
-
-        # Verify no sensitive information is leaked
-        # Should not contain file paths (they should be replaced with [path])
-        # Note: This is a basic check - actual paths depend on system
-        if "/Users/" in cached_text or "C:\\" in cached_text or "/home/" in cached_text:
-            # If we see actual paths, they should be sanitized
-            assert "[path]" in cached_text, "File paths should be sanitized to [path]"
+    # Execute a query that will fail with detailed error
+    try:
+        await client.call_tool("query", {"sql": "SELECT * FROM nonexistent_table"})
+    except Exception:
+        pass  # Expected to fail
+
+    query_id = await _last_query_id(client)
+
+    # Get the cached error result
+    cached_res = await client.call_tool("get_cached_result", {"query_id": query_id})
+    cached_text = cached_res.content[0].text
+
+    # Verify error is returned
+    assert cached_text.startswith("Query failed with error:\n")
+    assert cached_text.endswith("\n\nQuery was:\nSELECT * FROM nonexistent_table")
+
+    # Verify no sensitive information is leaked
+    # Should not contain file paths (they should be replaced with [path])
+    # Note: This is a basic check - actual paths depend on system
+    if "/Users/" in cached_text or "C:\\" in cached_text or "/home/" in cached_text:
+        # If we see actual paths, they should be sanitized
+        assert "[path]" in cached_text, "File paths should be sanitized to [path]"
+
+
+async def test_query_tables_persist_between_calls(client):
+    """Tables created by one query should be visible to the next."""
+    await client.call_tool("query", {"sql": "CREATE OR REPLACE TABLE persisted AS SELECT 7 AS value"})
+    res = await client.call_tool("query", {"sql": "SELECT value FROM persisted"})
+    assert "7" in res.content[0].text
+
+
+async def test_query_results_not_cached_by_default(client):
+    """Repeating the same SQL should see changes made in between."""
+    await client.call_tool("query", {"sql": "CREATE OR REPLACE TABLE counted AS SELECT 1 AS value"})
+    first = await client.call_tool("query", {"sql": "SELECT COUNT(*) AS n FROM counted"})
+    await client.call_tool("query", {"sql": "INSERT INTO counted VALUES (2)"})
+    second = await client.call_tool("query", {"sql": "SELECT COUNT(*) AS n FROM counted"})
+    assert first.content[0].text != second.content[0].text
+
+
+async def test_query_renders_nulls_as_empty_cells(client):
+    """NULL values should render as empty cells rather than pandas placeholders."""
+    res = await client.call_tool("query", {"sql": "SELECT 1 AS a, NULL::INT AS b, NULL::DATE AS c"})
+    text = res.content[0].text
+    assert "<NA>" not in text and "NaT" not in text and "nan" not in text
+    assert text.splitlines()[-1].replace(" ", "") == "|1|||"
+
+
+async def test_query_cache_only_reuses_selects(client, monkeypatch):
+    """With the cache on, writes always run and invalidate cached SELECT results."""
+    from functools import lru_cache
+
+    from data_analysis import tools
+
+    monkeypatch.setattr(tools, "QUERY_CACHE_SIZE", 16)
+    monkeypatch.setattr(tools, "_cached_query", lru_cache(maxsize=16)(tools._execute_query))
+
+    await client.call_tool("query", {"sql": "CREATE OR REPLACE TABLE cached_t (x INT)"})
+    await client.call_tool("query", {"sql": "INSERT INTO cached_t VALUES (1)"})
+    await client.call_tool("query", {"sql": "INSERT INTO cached_t VALUES (1)"})
+    first = await client.call_tool("query", {"sql": "SELECT count(*) AS n FROM cached_t"})
+    assert first.content[0].text.splitlines()[-1].replace(" ", "") == "|2|"
+
+    # A repeated SELECT is served from the cache
+    await client.call_tool("query", {"sql": "SELECT count(*) AS n FROM cached_t"})
+    assert tools._cached_query.cache_info().hits == 1
+
+    # A later write clears it, so the SELECT sees the new row
+    await client.call_tool("query", {"sql": "INSERT INTO cached_t VALUES (1)"})
+    third = await client.call_tool("query", {"sql": "SELECT count(*) AS n FROM cached_t"})
+    assert third.content[0].text.splitlines()[-1].replace(" ", "") == "|3|"
@@ -6,14 +6,21 @@ editable PowerPoint presentations by using GPT-5.2's vision capabilities
 to extract content and structure.
 """
 
+import asyncio
 import base64
-import json
+import contextlib
+import hashlib
+import io
 import os
+import tempfile
+import weakref
 from functools import lru_cache
 from pathlib import Path
 
+import orjson
 from fastmcp.exceptions import ToolError
-from openai import AuthenticationError, OpenAI, OpenAIError, RateLimitError
+from openai import AsyncOpenAI, AuthenticationError, OpenAIError, RateLimitError
+from PIL import Image, UnidentifiedImageError
 from pptx import Presentation
 from pptx.util import Inches, Pt
 
@@ -23,7 +30,23 @@ from . import mcp
 
 # Constants
 MAX_IMAGE_SIZE = 20_000_000  # 20MB
+MAX_CONCURRENT_REQUESTS = 8  # Cap on in-flight vision requests
+BATCH_MAX_SIZE = 8  # Max images sent in one vision request
+BATCH_MAX_WAIT = 0.05  # Seconds to wait for more images before sending a batch
+MAX_IMAGE_DIMENSION = 2048  # Vision API downsamples beyond this, so larger images are wasted upload
+JPEG_QUALITY = 85
+BASE64_STREAM_THRESHOLD = 1024 * 1024  # Smaller files are encoded in one read_bytes() call
+BASE64_CHUNK_SIZE = 57 * 1024  # Multiple of 3 so chunks encode without padding
+SUBTITLE_FONT_SIZE = Pt(18)
+REQUIRED_SLIDE_FIELDS = frozenset(["title", "subtitle", "bullets", "notes"])
 ALLOWED_EXTENSIONS = frozenset([".png", ".jpg", ".jpeg", ".webp", ".gif"])
+MIME_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+    ".gif": "image/gif",
+}
 FORBIDDEN_PATHS = frozenset(
     [
         "/bin",
@@ -37,82 +60,150 @@ FORBIDDEN_PATHS = frozenset(
         "/private/etc",  # macOS symlinks
     ]
 )
+# Precomputed so the forbidden-directory check is a single str.startswith call
+FORBIDDEN_PREFIXES = tuple(forbidden + "/" for forbidden in FORBIDDEN_PATHS)
+# Vision model (override with IMG2PPTX_MODEL, e.g. "gpt-4o-mini" for lower cost and latency)
+MODEL = os.getenv("IMG2PPTX_MODEL", "gpt-5.2")
+# Bump when the prompt or schema changes so stale cached extractions are ignored
+CACHE_VERSION = 1
+CACHE_DIR_NAME = ".img2pptx_cache"
+# Strict output schema: keeps responses compact and skips JSON-mode repair
+SLIDES_SCHEMA = {
+    "name": "slides",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "required": ["slides"],
+        "additionalProperties": False,
+        "properties": {
+            "slides": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["title", "subtitle", "bullets", "notes"],
+                    "additionalProperties": False,
+                    "properties": {
+                        "title": {"type": "string"},
+                        "subtitle": {"type": "string"},
+                        "bullets": {"type": "array", "items": {"type": "string"}},
+                        "notes": {"type": "string"},
+                    },
+                },
+            },
+        },
+    },
+}
 
 
 @lru_cache(maxsize=1)
-def _get_client() -> OpenAI:
+def _get_client() -> AsyncOpenAI:
     """Get configured OpenAI client."""
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise ToolError("OPENAI_API_KEY environment variable is not set")
-    return OpenAI(api_key=api_key.strip())
+    return AsyncOpenAI(api_key=api_key.strip())
 
 
 def _validate_image_path(path: Path) -> None:
-    """Validate input image path."""
-    if not path.exists():
-        raise FileNotFoundError(f"Image not found: {path}")
-    if path.stat().st_size > MAX_IMAGE_SIZE:
+    """Validate input image path with a single stat call."""
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Image not found: {path}") from None
+    if size > MAX_IMAGE_SIZE:
         raise ValueError(f"Image too large (max {MAX_IMAGE_SIZE // 1_000_000}MB)")
     if path.suffix.lower() not in ALLOWED_EXTENSIONS:
         raise ValueError(f"Unsupported format: {path.suffix}")
 
 
 def _validate_output_path(path: Path) -> None:
-    """Validate output path is safe to write to."""
-    resolved = str(path.resolve())
+    """Validate output path is safe to write to.
+
+    Callers pass an already resolved path (symlinks followed), so only lexical
+    normalization is done here, without further filesystem lookups.
+    """
     if path.suffix.lower() != ".pptx":
         raise ValueError(f"Output must be .pptx, got: {path.suffix}")
-    for forbidden in FORBIDDEN_PATHS:
-        if resolved == forbidden or resolved.startswith(forbidden + "/"):
-            raise ValueError(f"Cannot write to system directory: {forbidden}")
+    normalized = os.path.abspath(path)
+    if normalized in FORBIDDEN_PATHS or normalized.startswith(FORBIDDEN_PREFIXES):
+        forbidden = next(f for f in FORBIDDEN_PATHS if normalized == f or normalized.startswith(f + "/"))
+        raise ValueError(f"Cannot write to system directory: {forbidden}")
     if not path.parent.exists():
         path.parent.mkdir(parents=True, exist_ok=True)
 
 
+def _to_rgb(im: Image.Image) -> Image.Image:
+    """Flatten an image to RGB for JPEG, compositing any transparency onto white rather than black."""
+    if im.mode in ("RGBA", "LA", "PA") or (im.mode == "P" and "transparency" in im.info):
+        rgba = im.convert("RGBA")
+        background = Image.new("RGB", rgba.size, "white")
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return im.convert("RGB")
+
+
+def _downscale_image(image_path: Path) -> bytes | None:
+    """Re-encode an oversized image as JPEG within MAX_IMAGE_DIMENSION, or None if it already fits."""
+    try:
+        with Image.open(image_path) as im:
+            if max(im.size) <= MAX_IMAGE_DIMENSION:
+                return None
+            im.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION), Image.LANCZOS)
+            buf = io.BytesIO()
+            _to_rgb(im).save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        # Let the API judge files Pillow cannot (or will not) decode, sending the raw bytes
+        return None
+    return buf.getvalue()
+
+
 def _image_to_base64(image_path: Path) -> str:
-    """Convert image to base64 data URL."""
-    mime_types = {
-        ".png": "image/png",
-        ".jpg": "image/jpeg",
-        ".jpeg": "image/jpeg",
-        ".webp": "image/webp",
-        ".gif": "image/gif",
-    }
-    mime = mime_types.get(image_path.suffix.lower(), "image/png")
+    """Convert image to base64 data URL, downscaling oversized images first."""
+    data = _downscale_image(image_path)
+    if data is not None:
+        return "data:image/jpeg;base64," + base64.b64encode(data).decode("ascii")
+    mime = MIME_TYPES.get(image_path.suffix.lower(), "image/png")
+    if image_path.stat().st_size <= BASE64_STREAM_THRESHOLD:
+        return f"data:{mime};base64," + base64.b64encode(image_path.read_bytes()).decode("ascii")
+    # Stream large files so the raw bytes and their encoding are never both held in full
+    buf = bytearray(f"data:{mime};base64,".encode())
     with open(image_path, "rb") as f:
-        encoded = base64.b64encode(f.read()).decode("utf-8")
-    return f"data:{mime};base64,{encoded}"
+        while chunk := f.read(BASE64_CHUNK_SIZE):
+            buf += base64.b64encode(chunk)
+    return buf.decode("ascii")
+
 
+class _SlideResponseError(ValueError):
+    """The API call succeeded but its response could not be turned into one slide per image."""
 
-def _extract_slide_content(client: OpenAI, image_path: Path) -> dict[str, str | list[str]]:
-    """Use GPT-5.2 to extract slide content from image."""
-    base64_image = _image_to_base64(image_path)
 
+async def _request_slide_contents(client: AsyncOpenAI, image_urls: list[str]) -> list[dict[str, str | list[str]]]:
+    """Use the vision model to extract slide content from one or more images in a single request."""
     try:
-        response = client.chat.completions.create(
-            model="gpt-5.2",
+        response = await client.chat.completions.create(
+            model=MODEL,
             messages=[
                 {
                     "role": "system",
-                    "content": """You are a slide content extractor. Analyze the slide image and extract:
+                    "content": """You are a slide content extractor. You will receive one or more slide images.
+For each image, in the order given, extract:
 1. title: The main heading/title text
 2. subtitle: Any subtitle or tagline (empty string if none)
 3. bullets: List of bullet points (empty list if none)
 4. notes: Any additional context or speaker notes you can infer
 
-Respond in JSON format:
-{"title": "...", "subtitle": "...", "bullets": ["...", "..."], "notes": "..."}""",
+Respond in JSON format with exactly one entry per image, in the same order:
+{"slides": [{"title": "...", "subtitle": "...", "bullets": ["...", "..."], "notes": "..."}]}""",
                 },
                 {
                     "role": "user",
                     "content": [
-                        {"type": "text", "text": "Extract the content from this slide image:"},
-                        {"type": "image_url", "image_url": {"url": base64_image}},
+                        {"type": "text", "text": f"Extract the content from these {len(image_urls)} slide image(s):"},
+                        *({"type": "image_url", "image_url": {"url": url}} for url in image_urls),
                     ],
                 },
             ],
-            response_format={"type": "json_object"},
+            response_format={"type": "json_schema", "json_schema": SLIDES_SCHEMA},
         )
     except RateLimitError as e:
         raise ValueError(f"API rate limit exceeded: {e}") from e
@@ -124,22 +215,198 @@ Respond in JSON format:
     # Validate response content
     content = response.choices[0].message.content
     if not content:
-        raise ValueError("API returned empty response")
+        raise _SlideResponseError("API returned empty response")
 
     try:
-        data = json.loads(content)
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Failed to parse GPT response as JSON: {e}") from e
+        data = orjson.loads(content)
+    except orjson.JSONDecodeError as e:
+        raise _SlideResponseError(f"Failed to parse GPT response as JSON: {e}") from e
 
-    # Validate required fields
-    required_fields = {"title", "subtitle", "bullets", "notes"}
-    missing = required_fields - set(data.keys())
-    if missing:
-        raise ValueError(f"API response missing required fields: {missing}")
+    slides = data.get("slides") if isinstance(data, dict) else None
+    if not isinstance(slides, list) or len(slides) != len(image_urls):
+        raise _SlideResponseError(f"API response must contain {len(image_urls)} slide(s) under 'slides'")
+
+    # A bad slide fails the whole response
+    try:
+        return [_validate_slide_content(slide) for slide in slides]
+    except ValueError as e:
+        raise _SlideResponseError(str(e)) from e
 
+
+def _validate_slide_content(data: dict[str, str | list[str]]) -> dict[str, str | list[str]]:
+    """Check that extracted slide content has all required fields."""
+    missing = REQUIRED_SLIDE_FIELDS - data.keys()
+    if missing:
+        raise ValueError(f"API response missing required fields: {sorted(missing)}")
     return data
 
 
+class _SlideExtractBatcher:
+    """Coalesce concurrent slide extractions into multi-image requests.
+
+    Extractions queued within max_queue_time of each other (or until
+    max_batch_size images are pending) are sent as one chat completion, and
+    each caller's future is resolved with its own slide. If a batch response
+    is unusable, its images are retried one per request and only the images
+    whose own retry fails raise; API errors fail the whole batch at once. At most MAX_CONCURRENT_REQUESTS batch requests are
+    in flight at once.
+    """
+
+    def __init__(self, max_batch_size: int = BATCH_MAX_SIZE, max_queue_time: float = BATCH_MAX_WAIT):
+        self.max_batch_size = max_batch_size
+        self.max_queue_time = max_queue_time
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self._tasks: set[asyncio.Task] = set()
+
+    async def process(self, client: AsyncOpenAI, image_url: str) -> dict[str, str | list[str]]:
+        """Queue an image for extraction and wait for its slide content."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((image_url, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush(client)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_queue_time, self._flush, client)
+        return await future
+
+    def _flush(self, client: AsyncOpenAI) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(client, batch))
+            self._tasks.add(task)  # Keep a reference until the batch completes
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, client: AsyncOpenAI, batch: list[tuple[str, asyncio.Future]]) -> None:
+        try:
+            async with self._semaphore:
+                slides = await _request_slide_contents(client, [url for url, _ in batch])
+        except _SlideResponseError as e:
+            if len(batch) > 1:
+                # Batches mix unrelated callers: retry each image alone so one image
+                # the model cannot describe only fails its own future
+                await asyncio.gather(*(self._run(client, [item]) for item in batch))
+                return
+            self._fail(batch, e)
+            return
+        except Exception as e:
+            # API and transport errors (rate limits, bad key) would hit every retry too
+            self._fail(batch, e)
+            return
+
+        for (_, future), slide in zip(batch, slides):
+            if not future.done():
+                future.set_result(slide)
+
+    @staticmethod
+    def _fail(batch: list[tuple[str, asyncio.Future]], error: Exception) -> None:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+
+# One batcher per event loop, since futures and timers are loop-bound
+_batchers: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _SlideExtractBatcher] = weakref.WeakKeyDictionary()
+
+
+def _get_batcher() -> _SlideExtractBatcher:
+    """Get the slide extraction batcher for the running event loop."""
+    loop = asyncio.get_running_loop()
+    batcher = _batchers.get(loop)
+    if batcher is None:
+        batcher = _batchers[loop] = _SlideExtractBatcher()
+    return batcher
+
+
+def _cache_dir() -> Path:
+    """Directory holding cached extractions for the configured model."""
+    return get_workspace(WORKSPACE) / CACHE_DIR_NAME / MODEL
+
+
+def _cache_key(image_path: Path) -> str:
+    """Hash the image bytes together with the cache version."""
+    with open(image_path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256")
+    digest.update(f"v{CACHE_VERSION}".encode())
+    return digest.hexdigest()
+
+
+def _load_cached_slide(key: str) -> dict[str, str | list[str]] | None:
+    """Return cached slide content for key, or None on a miss or unreadable entry."""
+    try:
+        return _validate_slide_content(orjson.loads((_cache_dir() / f"{key}.json").read_bytes()))
+    except (OSError, ValueError):
+        return None
+
+
+def _store_cached_slide(key: str, content: dict[str, str | list[str]]) -> None:
+    """Atomically write slide content to the cache; failures are ignored."""
+    tmp_name = None
+    try:
+        cache_dir = _cache_dir()
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("wb", dir=cache_dir, suffix=".tmp", delete=False) as f:
+            tmp_name = f.name
+            f.write(orjson.dumps(content))
+        os.replace(tmp_name, cache_dir / f"{key}.json")
+    except OSError:
+        # Don't leave a partial temp file behind in the workspace
+        if tmp_name is not None:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_name)
+
+
+def _prepare_extraction(image_path: Path) -> tuple[str, dict[str, str | list[str]] | None, str | None]:
+    """Return the image's cache key with either its cached slide or, on a miss, its data URL."""
+    key = _cache_key(image_path)
+    cached = _load_cached_slide(key)
+    if cached is not None:
+        return key, cached, None
+    return key, None, _image_to_base64(image_path)
+
+
+async def _extract_slide_content(client: AsyncOpenAI, image_path: Path) -> dict[str, str | list[str]]:
+    """Use GPT-5.2 to extract slide content from image.
+
+    Results are cached on disk by image content hash, so only cache misses are
+    sent to the API. Concurrent misses are batched into multi-image requests
+    by _SlideExtractBatcher.
+    """
+    # Hashing, cache IO and encoding are CPU and file bound, so keep them off the event loop
+    key, cached, image_url = await asyncio.to_thread(_prepare_extraction, image_path)
+    if cached is not None:
+        return cached
+    content = await _get_batcher().process(client, image_url)
+    await asyncio.to_thread(_store_cached_slide, key, content)
+    return content
+
+
+@lru_cache(maxsize=1)
+def _template_bytes() -> bytes:
+    """Serialize the blank widescreen template once so later decks skip building it."""
+    prs = Presentation()
+    # Standard widescreen 16:9 dimensions (default for modern presentations)
+    prs.slide_width = Inches(13.333)
+    prs.slide_height = Inches(7.5)
+    buf = io.BytesIO()
+    prs.save(buf)
+    return buf.getvalue()
+
+
+def _new_presentation() -> Presentation:
+    """Create an empty widescreen presentation from the cached template."""
+    return Presentation(io.BytesIO(_template_bytes()))
+
+
+async def _extract_indexed(index: int, client: AsyncOpenAI, image_path: Path) -> tuple[int, dict[str, str | list[str]]]:
+    """Extract slide content, tagged with its position in the deck."""
+    return index, await _extract_slide_content(client, image_path)
+
+
 def _create_slide(prs: Presentation, content: dict[str, str | list[str]]) -> None:
     """Create a slide from extracted content."""
     # Use title and content layout, with fallback
@@ -154,22 +421,25 @@ def _create_slide(prs: Presentation, content: dict[str, str | list[str]]) -> Non
         slide.shapes.title.text = content.get("title", "")
 
     # Set subtitle/bullets in body
-    for shape in slide.placeholders:
-        if shape.placeholder_format.idx == 1:  # Body placeholder
-            tf = shape.text_frame
-            tf.clear()
-
-            subtitle = content.get("subtitle", "")
-            if subtitle:
-                p = tf.paragraphs[0]
-                p.text = subtitle
-                p.font.size = Pt(18)
-                p.font.bold = True
-
-            for bullet in content.get("bullets", []):
-                p = tf.add_paragraph()
-                p.text = bullet
-                p.level = 0
+    try:
+        body = slide.placeholders[1]  # Body placeholder
+    except KeyError:
+        body = None
+    if body is not None:
+        tf = body.text_frame
+        tf.clear()
+
+        subtitle = content.get("subtitle", "")
+        if subtitle:
+            p = tf.paragraphs[0]
+            p.text = subtitle
+            p.font.size = SUBTITLE_FONT_SIZE
+            p.font.bold = True
+
+        for bullet in content.get("bullets", []):
+            p = tf.add_paragraph()
+            p.text = bullet
+            p.level = 0
 
     # Add speaker notes
     notes = content.get("notes", "")
@@ -178,8 +448,13 @@ def _create_slide(prs: Presentation, content: dict[str, str | list[str]]) -> Non
         notes_slide.notes_text_frame.text = notes
 
 
-def _images_to_pptx_impl(image_paths: list[str], output_path: str) -> str:
-    """Convert multiple images to a single PPTX."""
+async def _images_to_pptx_impl(image_paths: list[str], output_path: str) -> str:
+    """Convert multiple images to a single PPTX.
+
+    Slides are extracted concurrently (batched into multi-image vision
+    requests) and each slide is built as soon as it and all earlier slides
+    are ready, so slide assembly overlaps with outstanding API calls.
+    """
     if not image_paths:
         return "Error: No images provided"
 
@@ -196,16 +471,30 @@ def _images_to_pptx_impl(image_paths: list[str], output_path: str) -> str:
 
         # All validation passed, now process images
         client = _get_client()
-        prs = Presentation()
-        # Standard widescreen 16:9 dimensions (default for modern presentations)
-        prs.slide_width = Inches(13.333)
-        prs.slide_height = Inches(7.5)
-
-        for path in resolved_paths:
-            content = _extract_slide_content(client, path)
-            _create_slide(prs, content)
 
-        prs.save(output)
+        prs = _new_presentation()
+        tasks = [
+            asyncio.create_task(_extract_indexed(index, client, path)) for index, path in enumerate(resolved_paths)
+        ]
+        ready: dict[int, dict[str, str | list[str]]] = {}
+        next_index = 0
+        try:
+            for completed in asyncio.as_completed(tasks):
+                index, content = await completed
+                ready[index] = content
+                # Build every slide that is now next in order while later ones are still in flight
+                while next_index in ready:
+                    await asyncio.to_thread(_create_slide, prs, ready.pop(next_index))
+                    next_index += 1
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Wait for cancellation to finish and retrieve every outcome, so a task that
+            # failed alongside (or while being cancelled) is not reported as unretrieved
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        # Zipping the deck is blocking I/O; keep the event loop free for other tool calls
+        await asyncio.to_thread(prs.save, output)
         return f"Created PPTX with {len(image_paths)} slides: {output}"
 
     except (FileNotFoundError, ValueError, OSError) as e:
@@ -214,9 +503,9 @@ def _images_to_pptx_impl(image_paths: list[str], output_path: str) -> str:
         return f"Unexpected error: {type(e).__name__}: {e}"
 
 
-def _image_to_pptx_impl(image_path: str, output_path: str) -> str:
+async def _image_to_pptx_impl(image_path: str, output_path: str) -> str:
     """Convert a single image to PPTX."""
-    return _images_to_pptx_impl([image_path], output_path)
+    return await _images_to_pptx_impl([image_path], output_path)
 
 
 @mcp.tool()
@@ -230,7 +519,7 @@ def get_workspace_path() -> str:
 
 
 @mcp.tool()
-def image_to_pptx(image_path: str, output_path: str) -> str:
+async def image_to_pptx(image_path: str, output_path: str) -> str:
     """
     Convert a slide image to an editable PPTX presentation.
 
@@ -250,16 +539,17 @@ def image_to_pptx(image_path: str, output_path: str) -> str:
             output_path="~/.mcp-servers/workspace/presentation.pptx"
         )
     """
-    return _image_to_pptx_impl(image_path, output_path)
+    return await _image_to_pptx_impl(image_path, output_path)
 
 
 @mcp.tool()
-def images_to_pptx(image_paths: list[str], output_path: str) -> str:
+async def images_to_pptx(image_paths: list[str], output_path: str) -> str:
     """
     Convert multiple slide images to a single PPTX presentation.
 
-    Uses OpenAI GPT-5.2 vision to extract text and structure from each image,
-    creating a multi-slide PowerPoint with editable content.
+    Uses OpenAI GPT-5.2 vision to extract text and structure from each image
+    (images are processed concurrently), creating a multi-slide PowerPoint
+    with editable content.
 
     Args:
         image_paths: List of paths to slide images (in order)
@@ -278,4 +568,4 @@ def images_to_pptx(image_paths: list[str], output_path: str) -> str:
             output_path="~/.mcp-servers/workspace/deck.pptx"
         )
     """
-    return _images_to_pptx_impl(image_paths, output_path)
+    return await _images_to_pptx_impl(image_paths, output_path)
@@ -0,0 +1,29 @@
+"""Test configuration and fixtures for img2pptx tests."""
+
+import pytest
+
+from img2pptx import tools
+
+
+@pytest.fixture(autouse=True)
+def no_openai_api_key(monkeypatch):
+    """Ensure no test reaches the real OpenAI API.
+
+    Tests that exercise extraction patch the client explicitly; anything that
+    falls through to _get_client() fails fast instead of making a network call.
+    """
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+
+@pytest.fixture(autouse=True)
+def slide_cache_dir(tmp_path, monkeypatch):
+    """Point the extraction cache at a per-test directory so results never leak between tests."""
+    cache_dir = tmp_path / "slide_cache"
+    monkeypatch.setattr(tools, "_cache_dir", lambda: cache_dir)
+    return cache_dir
+
+
+@pytest.fixture
+def prs():
+    """Fresh empty widescreen presentation, reloaded from the module's cached template bytes."""
+    return tools._new_presentation()
@@ -1,35 +1,67 @@
 """Tests for img2pptx tools."""
 
+import asyncio
+import base64
+import gc
 import json
-from pathlib import Path
-from unittest.mock import MagicMock, patch
+import logging
+import threading
+from io import BytesIO
+from pathlib import Path, PurePosixPath
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from openai import AuthenticationError, OpenAIError, RateLimitError
+from PIL import Image
 from pptx import Presentation
+from pptx.util import Inches
 
 from core import WORKSPACE, get_workspace
 
+from img2pptx import tools
 from img2pptx.tools import (
     _create_slide,
     _extract_slide_content,
+    _get_client,
     _image_to_base64,
     _images_to_pptx_impl,
+    _new_presentation,
     _validate_image_path,
     _validate_output_path,
 )
 
+# Minimal valid PNG (1x1 transparent pixel)
+_PNG_BYTES = bytes.fromhex(
+    "89504E470D0A1A0A0000000D49484452000000010000000108060000001F15C489"
+    "0000000A49444154789C63000100000500010D0A2DB40000000049454E44AE426082"
+)
+
+
+@pytest.fixture(scope="session")
+def shared_png(tmp_path_factory) -> Path:
+    """Minimal PNG written once per session for tests that only read it."""
+    path = tmp_path_factory.mktemp("png") / "slide.png"
+    path.write_bytes(_PNG_BYTES)
+    return path
+
 
 def test_validate_output_path_requires_pptx():
     """Output must have .pptx extension."""
     with pytest.raises(ValueError, match="must be .pptx"):
-        _validate_output_path(Path("/tmp/test.pdf"))
+        _validate_output_path(PurePosixPath("/tmp/test.pdf"))
 
 
 def test_validate_output_path_forbids_system_dirs():
     """Cannot write to system directories."""
     with pytest.raises(ValueError, match="system directory"):
-        _validate_output_path(Path("/etc/passwd.pptx"))
+        _validate_output_path(PurePosixPath("/etc/passwd.pptx"))
+
+
+def test_validate_output_path_blocks_traversal():
+    """Traversal into a system directory is caught after normalization."""
+    with pytest.raises(ValueError, match="system directory: /etc"):
+        _validate_output_path(PurePosixPath("/tmp/a/b/../../../etc/deck.pptx"))
 
 
 def test_validate_image_path_not_found():
@@ -62,82 +94,19 @@ def test_get_workspace_path():
     assert path.is_dir()
 
 
-def test_image_to_base64(tmp_path):
+def test_get_client_is_reused(monkeypatch):
+    """The OpenAI client and its connection pool should be built once and shared."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    _get_client.cache_clear()
+    try:
+        assert _get_client() is _get_client()
+    finally:
+        _get_client.cache_clear()
+
+
+def test_image_to_base64(shared_png):
     """Should convert image to base64 data URL."""
-    # Create a minimal PNG (1x1 transparent pixel)
-    png_data = bytes(
-        [
-            0x89,
-            0x50,
-            0x4E,
-            0x47,
-            0x0D,
-            0x0A,
-            0x1A,
-            0x0A,  # PNG signature
-            0x00,
-            0x00,
-            0x00,
-            0x0D,
-            0x49,
-            0x48,
-            0x44,
-            0x52,  # IHDR chunk
-            0x00,
-            0x00,
-            0x00,
-            0x01,
-            0x00,
-            0x00,
-            0x00,
-            0x01,
-            0x08,
-            0x06,
-            0x00,
-            0x00,
-            0x00,
-            0x1F,
-            0x15,
-            0xC4,
-            0x89,
-            0x00,
-            0x00,
-            0x00,
-            0x0A,
-            0x49,
-            0x44,
-            0x41,  # IDAT chunk
-            0x54,
-            0x78,
-            0x9C,
-            0x63,
-            0x00,
-            0x01,
-            0x00,
-            0x00,
-            0x05,
-            0x00,
-            0x01,
-            0x0D,
-            0x0A,
-            0x2D,
-            0xB4,
-            0x00,
-            0x00,
-            0x00,
-            0x00,
-            0x49,
-            0x45,
-            0x4E,
-            0x44,
-            0xAE,  # IEND chunk
-            0x42,
-            0x60,
-            0x82,
-        ]
-    )
-    test_image = tmp_path / "test.png"
-    test_image.write_bytes(png_data)
+    test_image = shared_png
 
     result = _image_to_base64(test_image)
     assert result.startswith("data:image/png;base64,")
@@ -154,9 +123,62 @@ def test_image_to_base64_gif_mime_type(tmp_path):
     assert result.startswith("data:image/gif;base64,")
 
 
-def test_create_slide_with_content():
+def test_image_to_base64_streams_large_file(tmp_path):
+    """Chunked encoding should match encoding the whole file at once."""
+    data = bytes(range(256)) * 5000  # Above the streaming threshold, spans several chunks
+    test_image = tmp_path / "large.png"
+    test_image.write_bytes(data)
+
+    result = _image_to_base64(test_image)
+    assert result == "data:image/png;base64," + base64.b64encode(data).decode("ascii")
+
+
+def test_image_to_base64_downscales_large_image(tmp_path):
+    """Images larger than the vision limit should be resized and re-encoded as JPEG."""
+    test_image = tmp_path / "big.png"
+    Image.new("RGB", (4096, 1024), "white").save(test_image)
+
+    result = _image_to_base64(test_image)
+    assert result.startswith("data:image/jpeg;base64,")
+    encoded = result.split(",", 1)[1]
+    with Image.open(BytesIO(base64.b64decode(encoded))) as im:
+        assert im.size == (2048, 512)
+
+
+def test_image_to_base64_downscale_composites_alpha_on_white(tmp_path):
+    """Transparent areas should turn white, not black, when re-encoded as JPEG."""
+    test_image = tmp_path / "transparent.png"
+    Image.new("RGBA", (4096, 1024), (0, 0, 0, 0)).save(test_image)
+
+    result = _image_to_base64(test_image)
+    assert result.startswith("data:image/jpeg;base64,")
+    with Image.open(BytesIO(base64.b64decode(result.split(",", 1)[1]))) as im:
+        assert all(channel >= 250 for channel in im.getpixel((0, 0)))
+
+
+def test_image_to_base64_decompression_bomb_sends_raw_bytes(tmp_path, monkeypatch):
+    """Images Pillow refuses to decode as too large should fall back to the original bytes."""
+    test_image = tmp_path / "bomb.png"
+    Image.new("RGB", (4096, 1024), "white").save(test_image)
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+
+    result = _image_to_base64(test_image)
+    assert result == "data:image/png;base64," + base64.b64encode(test_image.read_bytes()).decode("ascii")
+
+
+def test_new_presentation_is_widescreen_and_independent():
+    """Presentations from the cached template should be 16:9 and not share slides."""
+    first = _new_presentation()
+    first.slides.add_slide(first.slide_layouts[0])
+    second = _new_presentation()
+
+    assert second.slide_width == Inches(13.333)
+    assert second.slide_height == Inches(7.5)
+    assert len(second.slides) == 0
+
+
+def test_create_slide_with_content(prs):
     """Should create slide with title and bullets."""
-    prs = Presentation()
     content = {
         "title": "Test Title",
         "subtitle": "Test Subtitle",
@@ -169,11 +191,12 @@ def test_create_slide_with_content():
     assert len(prs.slides) == 1
     slide = prs.slides[0]
     assert slide.shapes.title.text == "Test Title"
+    body = slide.placeholders[1].text_frame
+    assert [p.text for p in body.paragraphs] == ["Test Subtitle", "Point 1", "Point 2"]
 
 
-def test_create_slide_empty_content():
+def test_create_slide_empty_content(prs):
     """Should handle empty content gracefully."""
-    prs = Presentation()
     content = {"title": "", "subtitle": "", "bullets": [], "notes": ""}
 
     _create_slide(prs, content)
@@ -186,170 +209,164 @@ def test_create_slide_empty_content():
 
 def _create_test_png(path: Path) -> None:
     """Create a minimal valid PNG file for testing."""
-    png_data = bytes(
-        [
-            0x89,
-            0x50,
-            0x4E,
-            0x47,
-            0x0D,
-            0x0A,
-            0x1A,
-            0x0A,  # PNG signature
-            0x00,
-            0x00,
-            0x00,
-            0x0D,
-            0x49,
-            0x48,
-            0x44,
-            0x52,  # IHDR chunk
-            0x00,
-            0x00,
-            0x00,
-            0x01,
-            0x00,
-            0x00,
-            0x00,
-            0x01,
-            0x08,
-            0x06,
-            0x00,
-            0x00,
-            0x00,
-            0x1F,
-            0x15,
-            0xC4,
-            0x89,
-            0x00,
-            0x00,
-            0x00,
-            0x0A,
-            0x49,
-            0x44,
-            0x41,  # IDAT chunk
-            0x54,
-            0x78,
-            0x9C,
-            0x63,
-            0x00,
-            0x01,
-            0x00,
-            0x00,
-            0x05,
-            0x00,
-            0x01,
-            0x0D,
-            0x0A,
-            0x2D,
-            0xB4,
-            0x00,
-            0x00,
-            0x00,
-            0x00,
-            0x49,
-            0x45,
-            0x4E,
-            0x44,
-            0xAE,  # IEND chunk
-            0x42,
-            0x60,
-            0x82,
-        ]
-    )
-    path.write_bytes(png_data)
+    path.write_bytes(_PNG_BYTES)
+
+
+TEST_SLIDE = {
+    "title": "Test Slide Title",
+    "subtitle": "Test Subtitle",
+    "bullets": ["Point 1", "Point 2", "Point 3"],
+    "notes": "These are speaker notes",
+}
+
+
+def _image_urls(request_kwargs: dict) -> list[str]:
+    """Get the image URLs sent in a mocked chat completion request."""
+    parts = request_kwargs["messages"][1]["content"]
+    return [part["image_url"]["url"] for part in parts if part["type"] == "image_url"]
+
+
+def _fake_client(response=None, *, side_effect=None) -> SimpleNamespace:
+    """Minimal stand-in for AsyncOpenAI exposing only chat.completions.create."""
+    create = AsyncMock(return_value=response, side_effect=side_effect)
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
 
 
-@pytest.fixture
+def _completion(content: str | None) -> SimpleNamespace:
+    """Create a fake chat completion with the given message content."""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _mock_response(slides: list[dict]) -> SimpleNamespace:
+    """Create a mock OpenAI API response for a batch of slides."""
+    return _completion(json.dumps({"slides": slides}))
+
+
+@pytest.fixture(scope="session")
 def mock_openai_response():
-    """Create a mock OpenAI API response."""
-    mock_response = MagicMock()
-    mock_response.choices = [MagicMock()]
-    mock_response.choices[0].message.content = json.dumps(
-        {
-            "title": "Test Slide Title",
-            "subtitle": "Test Subtitle",
-            "bullets": ["Point 1", "Point 2", "Point 3"],
-            "notes": "These are speaker notes",
-        }
-    )
-    return mock_response
+    """Create a mock OpenAI API response, shared since the code under test only reads it."""
+    return _mock_response([TEST_SLIDE])
 
 
-def test_extract_slide_content_with_mock(tmp_path, mock_openai_response):
+@pytest.mark.asyncio
+async def test_extract_slide_content_with_mock(shared_png, mock_openai_response):
     """Should extract slide content using OpenAI API."""
-    test_image = tmp_path / "slide.png"
-    _create_test_png(test_image)
+    test_image = shared_png
 
-    mock_client = MagicMock()
-    mock_client.chat.completions.create.return_value = mock_openai_response
+    mock_client = _fake_client(mock_openai_response)
 
-    result = _extract_slide_content(mock_client, test_image)
+    result = await _extract_slide_content(mock_client, test_image)
 
     assert result["title"] == "Test Slide Title"
     assert result["subtitle"] == "Test Subtitle"
     assert len(result["bullets"]) == 3
     assert result["notes"] == "These are speaker notes"
     mock_client.chat.completions.create.assert_called_once()
+    response_format = mock_client.chat.completions.create.call_args.kwargs["response_format"]
+    assert response_format["type"] == "json_schema"
+
+
+@pytest.mark.asyncio
+async def test_extract_slide_content_file_work_off_event_loop(shared_png, mock_openai_response, monkeypatch):
+    """Hashing, cache IO and image encoding should run in worker threads, not on the event loop."""
+    threads = {}
+
+    def record(name):
+        original = getattr(tools, name)
+
+        def wrapper(*args):
+            threads[name] = threading.current_thread()
+            return original(*args)
+
+        monkeypatch.setattr(tools, name, wrapper)
+
+    for name in ("_cache_key", "_load_cached_slide", "_image_to_base64", "_store_cached_slide"):
+        record(name)
+
+    await _extract_slide_content(_fake_client(mock_openai_response), shared_png)
+
+    assert threads.keys() == {"_cache_key", "_load_cached_slide", "_image_to_base64", "_store_cached_slide"}
+    assert threading.main_thread() not in threads.values()
+
+
+@pytest.mark.asyncio
+async def test_extract_slide_content_uses_cache(tmp_path, mock_openai_response, slide_cache_dir):
+    """Repeated extraction of identical image bytes should hit the on-disk cache."""
+    first = tmp_path / "first.png"
+    second = tmp_path / "second.png"
+    _create_test_png(first)
+    _create_test_png(second)
+
+    mock_client = _fake_client(mock_openai_response)
+
+    await _extract_slide_content(mock_client, first)
+    result = await _extract_slide_content(mock_client, second)
+
+    assert result["title"] == "Test Slide Title"
+    mock_client.chat.completions.create.assert_called_once()
+    assert len(list(slide_cache_dir.glob("*.json"))) == 1
+
+
+def test_store_cached_slide_removes_temp_file_on_failure(slide_cache_dir, monkeypatch):
+    """A failed cache write should not leave its temp file in the cache directory."""
+
+    def fail_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(tools.os, "replace", fail_replace)
+
+    tools._store_cached_slide("key", TEST_SLIDE)
+
+    assert slide_cache_dir.is_dir()
+    assert list(slide_cache_dir.iterdir()) == []
 
 
-def test_extract_slide_content_api_error(tmp_path):
+@pytest.mark.asyncio
+async def test_extract_slide_content_api_error(shared_png):
     """Should raise ValueError on generic OpenAI API error."""
-    test_image = tmp_path / "slide.png"
-    _create_test_png(test_image)
+    test_image = shared_png
 
-    mock_client = MagicMock()
-    mock_client.chat.completions.create.side_effect = OpenAIError("Connection failed")
+    mock_client = _fake_client(side_effect=OpenAIError("Connection failed"))
 
     with pytest.raises(ValueError, match="OpenAI API error"):
-        _extract_slide_content(mock_client, test_image)
+        await _extract_slide_content(mock_client, test_image)
 
 
-def test_extract_slide_content_rate_limit_error(tmp_path):
+@pytest.mark.asyncio
+async def test_extract_slide_content_rate_limit_error(shared_png):
     """Should raise ValueError with specific message on rate limit."""
-    test_image = tmp_path / "slide.png"
-    _create_test_png(test_image)
+    test_image = shared_png
 
-    mock_client = MagicMock()
-    mock_client.chat.completions.create.side_effect = RateLimitError(
-        "Rate limit exceeded", response=MagicMock(), body=None
-    )
+    mock_client = _fake_client(side_effect=RateLimitError("Rate limit exceeded", response=MagicMock(), body=None))
 
     with pytest.raises(ValueError, match="rate limit exceeded"):
-        _extract_slide_content(mock_client, test_image)
+        await _extract_slide_content(mock_client, test_image)
 
 
-def test_extract_slide_content_auth_error(tmp_path):
+@pytest.mark.asyncio
+async def test_extract_slide_content_auth_error(shared_png):
     """Should raise ValueError with specific message on auth error."""
-    test_image = tmp_path / "slide.png"
-    _create_test_png(test_image)
+    test_image = shared_png
 
-    mock_client = MagicMock()
-    mock_client.chat.completions.create.side_effect = AuthenticationError(
-        "Invalid API key", response=MagicMock(), body=None
-    )
+    mock_client = _fake_client(side_effect=AuthenticationError("Invalid API key", response=MagicMock(), body=None))
 
     with pytest.raises(ValueError, match="Invalid OpenAI API key"):
-        _extract_slide_content(mock_client, test_image)
+        await _extract_slide_content(mock_client, test_image)
 
 
-def test_extract_slide_content_malformed_json(tmp_path):
+@pytest.mark.asyncio
+async def test_extract_slide_content_malformed_json(shared_png):
     """Should raise ValueError on malformed JSON response."""
-    test_image = tmp_path / "slide.png"
-    _create_test_png(test_image)
+    test_image = shared_png
 
-    mock_response = MagicMock()
-    mock_response.choices = [MagicMock()]
-    mock_response.choices[0].message.content = "not valid json {"
-
-    mock_client = MagicMock()
-    mock_client.chat.completions.create.return_value = mock_response
+    mock_client = _fake_client(_completion("not valid json {"))
 
     with pytest.raises(ValueError, match="Failed to parse GPT response as JSON"):
-        _extract_slide_content(mock_client, test_image)
+        await _extract_slide_content(mock_client, test_image)
 
 
-def test_images_to_pptx_impl_integration(tmp_path, mock_openai_response):
+@pytest.mark.asyncio
+async def test_images_to_pptx_impl_integration(tmp_path, mock_openai_response):
     """Integration test for full image-to-PPTX flow."""
     # Create test images
     image1 = tmp_path / "slide1.png"
@@ -359,12 +376,14 @@ def test_images_to_pptx_impl_integration(tmp_path, mock_openai_response):
 
     output_path = tmp_path / "output.pptx"
 
+    async def create(**kwargs):
+        return _mock_response([TEST_SLIDE] * len(_image_urls(kwargs)))
+
     with patch("img2pptx.tools._get_client") as mock_get_client:
-        mock_client = MagicMock()
-        mock_client.chat.completions.create.return_value = mock_openai_response
+        mock_client = _fake_client(side_effect=create)
         mock_get_client.return_value = mock_client
 
-        result = _images_to_pptx_impl([str(image1), str(image2)], str(output_path))
+        result = await _images_to_pptx_impl([str(image1), str(image2)], str(output_path))
 
     assert "Created PPTX with 2 slides" in result
     assert output_path.exists()
@@ -374,65 +393,211 @@ def test_images_to_pptx_impl_integration(tmp_path, mock_openai_response):
     assert len(prs.slides) == 2
 
 
-def test_images_to_pptx_validates_all_before_api_call(tmp_path, mock_openai_response):
+@pytest.mark.asyncio
+async def test_images_to_pptx_keeps_order_when_completed_out_of_order(tmp_path):
+    """Slides should follow input order even when later extractions finish first."""
+    images = [tmp_path / f"slide{i}.png" for i in range(3)]
+    for image in images:
+        _create_test_png(image)
+    output_path = tmp_path / "output.pptx"
+
+    async def extract(client, image_path):
+        index = images.index(image_path)
+        await asyncio.sleep(0.01 * (len(images) - index))  # Last image finishes first
+        return {**TEST_SLIDE, "title": f"Slide {index}"}
+
+    with (
+        patch("img2pptx.tools._get_client"),
+        patch("img2pptx.tools._extract_slide_content", side_effect=extract),
+    ):
+        result = await _images_to_pptx_impl([str(image) for image in images], str(output_path))
+
+    assert "Created PPTX with 3 slides" in result
+    prs = Presentation(str(output_path))
+    assert [slide.shapes.title.text for slide in prs.slides] == ["Slide 0", "Slide 1", "Slide 2"]
+
+
+@pytest.mark.asyncio
+async def test_images_to_pptx_retrieves_all_failures(tmp_path, caplog):
+    """When extractions fail, the rest should be cancelled and awaited so no exception goes unretrieved."""
+    images = [tmp_path / f"slide{i}.png" for i in range(5)]
+    for image in images:
+        _create_test_png(image)
+    output_path = tmp_path / "output.pptx"
+    unwound = set()
+
+    async def extract(client, image_path):
+        index = images.index(image_path)
+        try:
+            if index == 1:
+                raise ValueError("Slide 1 failed")
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            if index == 3:
+                raise ValueError("Slide 3 failed while cancelling") from None
+            raise
+        finally:
+            unwound.add(index)
+        return TEST_SLIDE
+
+    with (
+        patch("img2pptx.tools._get_client"),
+        patch("img2pptx.tools._extract_slide_content", side_effect=extract),
+        caplog.at_level(logging.ERROR, logger="asyncio"),
+    ):
+        result = await _images_to_pptx_impl([str(image) for image in images], str(output_path))
+        assert unwound == set(range(5))  # Cancellation finished before the tool returned
+        gc.collect()  # Unretrieved task exceptions are reported when the task is collected
+
+    assert result == "Error: Slide 1 failed"
+    assert "exception was never retrieved" not in caplog.text
+    assert not output_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_extract_slide_content_batches_concurrent_calls(tmp_path):
+    """Concurrent extractions should share one multi-image request and keep their own slide."""
+    images = [tmp_path / f"slide{i}.png" for i in range(3)]
+    for i, image in enumerate(images):
+        _create_test_png(image)
+        with open(image, "ab") as f:
+            f.write(bytes([i]))  # Distinct payload per image
+
+    urls = [_image_to_base64(image) for image in images]
+
+    async def create(**kwargs):
+        slides = [{**TEST_SLIDE, "title": f"Slide {urls.index(url)}"} for url in _image_urls(kwargs)]
+        return _mock_response(slides)
+
+    mock_client = _fake_client(side_effect=create)
+
+    results = await asyncio.gather(*(_extract_slide_content(mock_client, image) for image in images))
+
+    assert [result["title"] for result in results] == ["Slide 0", "Slide 1", "Slide 2"]
+    mock_client.chat.completions.create.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_extract_slide_content_wrong_slide_count_retries_individually(tmp_path, mock_openai_response):
+    """A batch response without one slide per image should be retried one image per request."""
+    images = [tmp_path / "slide1.png", tmp_path / "slide2.png"]
+    for i, image in enumerate(images):
+        _create_test_png(image)
+        with open(image, "ab") as f:
+            f.write(bytes([i]))  # Distinct payload per image
+
+    mock_client = _fake_client(mock_openai_response)
+
+    results = await asyncio.gather(*(_extract_slide_content(mock_client, image) for image in images))
+
+    assert [result["title"] for result in results] == ["Test Slide Title"] * 2
+    # One failed batch request, then one request per image
+    assert mock_client.chat.completions.create.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_extract_slide_content_batch_failure_only_fails_bad_image(tmp_path):
+    """An image that breaks its batch should fail alone, not every caller batched with it."""
+    images = [tmp_path / f"slide{i}.png" for i in range(3)]
+    for i, image in enumerate(images):
+        _create_test_png(image)
+        with open(image, "ab") as f:
+            f.write(bytes([i]))  # Distinct payload per image
+
+    urls = [_image_to_base64(image) for image in images]
+    bad_url = urls[1]
+
+    async def create(**kwargs):
+        request_urls = _image_urls(kwargs)
+        if bad_url in request_urls:
+            return _completion("not valid json {")
+        return _mock_response([{**TEST_SLIDE, "title": f"Slide {urls.index(url)}"} for url in request_urls])
+
+    mock_client = _fake_client(side_effect=create)
+
+    results = await asyncio.gather(
+        *(_extract_slide_content(mock_client, image) for image in images), return_exceptions=True
+    )
+
+    assert results[0]["title"] == "Slide 0"
+    assert isinstance(results[1], ValueError)
+    assert str(results[1]).startswith("Failed to parse GPT response as JSON")
+    assert results[2]["title"] == "Slide 2"
+    assert mock_client.chat.completions.create.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_extract_slide_content_api_error_fails_batch_without_retry(tmp_path):
+    """API errors such as rate limits should fail the whole batch instead of multiplying requests."""
+    images = [tmp_path / f"slide{i}.png" for i in range(3)]
+    for i, image in enumerate(images):
+        _create_test_png(image)
+        with open(image, "ab") as f:
+            f.write(bytes([i]))  # Distinct payload per image
+
+    mock_client = _fake_client(side_effect=RateLimitError("Rate limit exceeded", response=MagicMock(), body=None))
+
+    results = await asyncio.gather(
+        *(_extract_slide_content(mock_client, image) for image in images), return_exceptions=True
+    )
+
+    assert [str(result) for result in results] == ["API rate limit exceeded: Rate limit exceeded"] * 3
+    mock_client.chat.completions.create.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_images_to_pptx_validates_all_before_api_call(tmp_path, shared_png, mock_openai_response):
     """Should validate all images before making any API calls."""
-    valid_image = tmp_path / "valid.png"
-    _create_test_png(valid_image)
+    valid_image = shared_png
     invalid_image = tmp_path / "missing.png"  # Does not exist
 
     output_path = tmp_path / "output.pptx"
 
     with patch("img2pptx.tools._get_client") as mock_get_client:
-        mock_client = MagicMock()
-        mock_client.chat.completions.create.return_value = mock_openai_response
+        mock_client = _fake_client(mock_openai_response)
         mock_get_client.return_value = mock_client
 
-        result = _images_to_pptx_impl([str(valid_image), str(invalid_image)], str(output_path))
+        result = await _images_to_pptx_impl([str(valid_image), str(invalid_image)], str(output_path))
 
     assert "Error" in result
     # API should NOT have been called since validation failed
     mock_client.chat.completions.create.assert_not_called()
 
 
-def test_images_to_pptx_empty_list(tmp_path):
+@pytest.mark.asyncio
+async def test_images_to_pptx_empty_list(tmp_path):
     """Should return error for empty image list."""
     output_path = tmp_path / "output.pptx"
-    result = _images_to_pptx_impl([], str(output_path))
+    result = await _images_to_pptx_impl([], str(output_path))
     assert "Error: No images provided" in result
 
 
-def test_extract_slide_content_empty_response(tmp_path):
+@pytest.mark.asyncio
+async def test_extract_slide_content_empty_response(shared_png):
     """Should raise ValueError on empty API response."""
-    test_image = tmp_path / "slide.png"
-    _create_test_png(test_image)
-
-    mock_response = MagicMock()
-    mock_response.choices = [MagicMock()]
-    mock_response.choices[0].message.content = None
+    test_image = shared_png
 
-    mock_client = MagicMock()
-    mock_client.chat.completions.create.return_value = mock_response
+    mock_client = _fake_client(_completion(None))
 
     with pytest.raises(ValueError, match="API returned empty response"):
-        _extract_slide_content(mock_client, test_image)
+        await _extract_slide_content(mock_client, test_image)
 
 
-def test_extract_slide_content_missing_fields(tmp_path):
+@pytest.mark.asyncio
+async def test_extract_slide_content_missing_fields(shared_png):
     """Should raise ValueError when response is missing required fields."""
-    test_image = tmp_path / "slide.png"
-    _create_test_png(test_image)
-
-    mock_response = MagicMock()
-    mock_response.choices = [MagicMock()]
-    mock_response.choices[0].message.content = json.dumps(
-        {
-            "title": "Test Title",
-            # Missing: subtitle, bullets, notes
-        }
+    test_image = shared_png
+
+    mock_response = _mock_response(
+        [
+            {
+                "title": "Test Title",
+                # Missing: subtitle, bullets, notes
+            }
+        ]
     )
 
-    mock_client = MagicMock()
-    mock_client.chat.completions.create.return_value = mock_response
+    mock_client = _fake_client(mock_response)
 
     with pytest.raises(ValueError, match="missing required fields"):
-        _extract_slide_content(mock_client, test_image)
+        await _extract_slide_content(mock_client, test_image)
@@ -7,7 +7,11 @@ Provides AI image generation using Google Gemini's Nano Banana models:
 """
 
 import base64
+import math
 import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from io import BytesIO
 from pathlib import Path
 
@@ -21,7 +25,18 @@ from . import mcp
 
 # Constants
 MAX_IMAGE_SIZE = 20_000_000  # 20MB limit for input images
-ALLOWED_EXTENSIONS = frozenset([".png", ".jpg", ".jpeg", ".webp", ".gif"])
+MAX_IMAGE_DIMENSION = 2048  # Larger JPEG inputs are decoded at a reduced scale
+BASE64_STREAM_THRESHOLD = 1024 * 1024  # Smaller files are encoded in one read_bytes() call
+BASE64_CHUNK_SIZE = 768 * 1024  # Multiple of 3 so chunks encode without padding
+ASSET_CACHE_SIZE = 256  # Slide asset requests remembered for de-duplication
+MIME_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+    ".gif": "image/gif",
+}
+ALLOWED_EXTENSIONS = frozenset(MIME_TYPES)
 # Forbidden system directories (include /private/* for macOS compatibility)
 FORBIDDEN_PATHS = frozenset(
     [
@@ -36,6 +51,8 @@ FORBIDDEN_PATHS = frozenset(
         "/private/etc",
     ]
 )
+# Precomputed so the forbidden-directory check is a single str.startswith call
+FORBIDDEN_PREFIXES = tuple(forbidden + "/" for forbidden in FORBIDDEN_PATHS)
 
 # Model configuration (model IDs as of Dec 2025, may change)
 MODELS = {
@@ -67,32 +84,58 @@ THEME_STYLES = {
     "corporate": "Conservative, professional palette with blues and grays.",
 }
 
+# Option lists for error messages, formatted once
+_AVAILABLE_MODELS = repr(list(MODELS))
+_AVAILABLE_ASSET_TYPES = repr(list(ASSET_PROMPTS))
+_AVAILABLE_THEMES = repr(list(THEME_STYLES))
+
+# (asset_type, description, theme, model, output path) -> mtime_ns of the file it produced.
+# A repeated request whose output is untouched since then returns the existing file
+# instead of paying for another generation; oldest entries are evicted first.
+_asset_cache: OrderedDict[tuple[str, str, str, str, str], int] = OrderedDict()
+
+# (prefix, suffix) around the description for every asset type and theme, so building a
+# prompt is a concatenation instead of a str.format call
+_ASSET_PROMPT_PARTS = {
+    (asset_type, theme): tuple(template.replace("{theme_style}", theme_style).split("{desc}"))
+    for asset_type, template in ASSET_PROMPTS.items()
+    for theme, theme_style in THEME_STYLES.items()
+}
+
+
+@lru_cache(maxsize=4)
+def _client_for(api_key: str) -> genai.Client:
+    """Get the Gemini client for an API key, reusing its HTTP session across calls."""
+    return genai.Client(api_key=api_key)
+
 
 def _get_client() -> genai.Client:
     """Get configured Gemini client."""
     api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
     if not api_key:
         raise ValueError("GEMINI_API_KEY or GOOGLE_API_KEY environment variable required")
-    return genai.Client(api_key=api_key)
+    # Keyed by the key itself so a rotated key gets a fresh client
+    return _client_for(api_key)
 
 
 def _validate_output_path(path: Path) -> None:
     """Validate output path is safe to write to.
 
-    Resolves the path internally to prevent path traversal attacks.
+    Normalizes the path internally to prevent path traversal attacks.
 
     Args:
-        path: Path to validate (will be resolved internally)
+        path: Path to validate; callers pass it already resolved, so symlinks are followed
     """
-    # Resolve path to prevent traversal attacks like /tmp/../etc/passwd
-    resolved_path = str(path.resolve())
-
-    if path.suffix.lower() not in ALLOWED_EXTENSIONS:
-        raise ValueError(f"Output file must have image extension {ALLOWED_EXTENSIONS}, got: {path.suffix}")
+    suffix = path.suffix
+    if suffix.lower() not in ALLOWED_EXTENSIONS:
+        raise ValueError(f"Output file must have image extension {ALLOWED_EXTENSIONS}, got: {suffix}")
 
-    for forbidden in FORBIDDEN_PATHS:
-        if resolved_path.startswith(forbidden + "/"):
-            raise ValueError(f"Cannot write to system directory: {forbidden}")
+    # Collapse traversal like /tmp/../etc/passwd lexically; callers already paid for
+    # resolve(), so don't stat every component again
+    normalized = os.path.abspath(path)
+    if normalized.startswith(FORBIDDEN_PREFIXES):
+        forbidden = next(f for f in FORBIDDEN_PATHS if normalized.startswith(f + "/"))
+        raise ValueError(f"Cannot write to system directory: {forbidden}")
 
     if not path.parent.exists():
         try:
@@ -106,14 +149,22 @@ def _save_image_from_response(response, output_path: Path) -> str | None:
     if not response.candidates or not response.candidates[0].content.parts:
         return None
 
-    for part in response.candidates[0].content.parts:
-        if hasattr(part, "inline_data") and part.inline_data:
-            image_data = BytesIO(part.inline_data.data)
-            img = Image.open(image_data)
-            img.save(output_path)
-            return str(output_path)
+    parts = response.candidates[0].content.parts
+    blob = next((part.inline_data for part in parts if getattr(part, "inline_data", None)), None)
+    if blob is None:
+        return None
+
+    if blob.mime_type == MIME_TYPES.get(output_path.suffix.lower()):
+        # Already in the requested format: write the bytes instead of decoding and re-encoding
+        output_path.write_bytes(blob.data)
+    else:
+        Image.open(BytesIO(blob.data)).save(output_path)
+    return str(output_path)
 
-    return None
+
+def _response_text(response) -> str | None:
+    """Get the first text part of a Gemini response, if any."""
+    return next((part.text for part in response.candidates[0].content.parts if getattr(part, "text", None)), None)
 
 
 def _load_image(image_path: str) -> Image.Image:
@@ -126,10 +177,17 @@ def _load_image(image_path: str) -> Image.Image:
     if path.stat().st_size > MAX_IMAGE_SIZE:
         raise ValueError(f"Image file too large (max {MAX_IMAGE_SIZE // 1_000_000}MB)")
 
-    if path.suffix.lower() not in ALLOWED_EXTENSIONS:
-        raise ValueError(f"Unsupported image format: {path.suffix}")
+    suffix = path.suffix
+    if suffix.lower() not in ALLOWED_EXTENSIONS:
+        raise ValueError(f"Unsupported image format: {suffix}")
 
-    return Image.open(path)
+    img = Image.open(path)
+    longest = max(img.size)
+    if img.format == "JPEG" and longest > MAX_IMAGE_DIMENSION:
+        # Let libjpeg scale during decode (by 1/2, 1/4 or 1/8, keeping the longest side at
+        # least MAX_IMAGE_DIMENSION) instead of decoding every pixel of an oversized input
+        img.draft("RGB", tuple(math.ceil(side * MAX_IMAGE_DIMENSION / longest) for side in img.size))
+    return img
 
 
 # ======================================================
@@ -145,14 +203,15 @@ def _generate_image_impl(
 ) -> str:
     """Implementation of generate_image."""
     try:
-        client = _get_client()
-
+        # Validate cheap inputs before building the client
         if model not in MODELS:
-            return f"Error: Unknown model '{model}'. Available: {list(MODELS.keys())}"
+            return f"Error: Unknown model '{model}'. Available: {_AVAILABLE_MODELS}"
 
         output = Path(output_path).expanduser().resolve()
         _validate_output_path(output)
 
+        client = _get_client()
+
         full_prompt = f"{prompt}. Style: {style}" if style else prompt
 
         response = client.models.generate_content(
@@ -166,9 +225,9 @@ def _generate_image_impl(
         if saved_path:
             return f"Generated image saved to: {saved_path}"
         else:
-            for part in response.candidates[0].content.parts:
-                if hasattr(part, "text") and part.text:
-                    return f"Model response: {part.text}"
+            text = _response_text(response)
+            if text:
+                return f"Model response: {text}"
             return "Error: No image generated. Try a different prompt."
 
     except Exception as e:
@@ -183,15 +242,16 @@ def _edit_image_impl(
 ) -> str:
     """Implementation of edit_image."""
     try:
-        client = _get_client()
-
+        # Validate cheap inputs before building the client
         if model not in MODELS:
-            return f"Error: Unknown model '{model}'. Available: {list(MODELS.keys())}"
+            return f"Error: Unknown model '{model}'. Available: {_AVAILABLE_MODELS}"
 
-        img = _load_image(image_path)
         output = Path(output_path).expanduser().resolve()
         _validate_output_path(output)
 
+        client = _get_client()
+        img = _load_image(image_path)
+
         response = client.models.generate_content(
             model=MODELS[model],
             contents=[prompt, img],
@@ -203,9 +263,9 @@ def _edit_image_impl(
         if saved_path:
             return f"Edited image saved to: {saved_path}"
         else:
-            for part in response.candidates[0].content.parts:
-                if hasattr(part, "text") and part.text:
-                    return f"Model response: {part.text}"
+            text = _response_text(response)
+            if text:
+                return f"Model response: {text}"
             return "Error: No image generated. Try a different prompt."
 
     except Exception as e:
@@ -222,22 +282,38 @@ def _generate_slide_asset_impl(
     """Implementation of generate_slide_asset."""
     try:
         if asset_type not in ASSET_PROMPTS:
-            return f"Error: Unknown asset type '{asset_type}'. Available: {list(ASSET_PROMPTS.keys())}"
+            return f"Error: Unknown asset type '{asset_type}'. Available: {_AVAILABLE_ASSET_TYPES}"
 
         if theme not in THEME_STYLES:
-            return f"Error: Unknown theme '{theme}'. Available: {list(THEME_STYLES.keys())}"
-
-        prompt_template = ASSET_PROMPTS[asset_type]
-        theme_style = THEME_STYLES[theme]
+            return f"Error: Unknown theme '{theme}'. Available: {_AVAILABLE_THEMES}"
 
-        full_prompt = prompt_template.format(desc=description, theme_style=theme_style)
-
-        return _generate_image_impl(
+        output = Path(output_path).expanduser().resolve()
+        key = (asset_type, description, theme, model, str(output))
+        mtime_ns = _asset_cache.get(key)
+        if mtime_ns is not None:
+            try:
+                if output.stat().st_mtime_ns == mtime_ns:
+                    _asset_cache.move_to_end(key)
+                    return f"Generated image saved to: {output} (reused identical earlier request)"
+            except FileNotFoundError:
+                pass
+            del _asset_cache[key]
+
+        prefix, suffix = _ASSET_PROMPT_PARTS[asset_type, theme]
+        full_prompt = prefix + description + suffix
+
+        result = _generate_image_impl(
             prompt=full_prompt,
             output_path=output_path,
             model=model,
         )
 
+        if result.startswith("Generated image saved to:"):
+            _asset_cache[key] = output.stat().st_mtime_ns
+            if len(_asset_cache) > ASSET_CACHE_SIZE:
+                _asset_cache.popitem(last=False)
+        return result
+
     except Exception as e:
         return f"Error generating slide asset: {e}"
 
@@ -255,15 +331,19 @@ def _fuse_images_impl(
         if len(image_paths) > 5:
             return "Error: Maximum 5 images supported"
 
-        client = _get_client()
-
         if model not in MODELS:
-            return f"Error: Unknown model '{model}'. Available: {list(MODELS.keys())}"
+            return f"Error: Unknown model '{model}'. Available: {_AVAILABLE_MODELS}"
 
-        images = [_load_image(p) for p in image_paths]
         output = Path(output_path).expanduser().resolve()
         _validate_output_path(output)
 
+        client = _get_client()
+
+        # Overlap the stat/open/header reads of the 2-5 inputs; map keeps input order
+        # and re-raises the first load error here
+        with ThreadPoolExecutor(max_workers=len(image_paths)) as pool:
+            images = list(pool.map(_load_image, image_paths))
+
         contents = [prompt] + images
 
         response = client.models.generate_content(
@@ -277,9 +357,9 @@ def _fuse_images_impl(
         if saved_path:
             return f"Fused image saved to: {saved_path}"
         else:
-            for part in response.candidates[0].content.parts:
-                if hasattr(part, "text") and part.text:
-                    return f"Model response: {part.text}"
+            text = _response_text(response)
+            if text:
+                return f"Model response: {text}"
             return "Error: No image generated. Try a different prompt."
 
     except Exception as e:
@@ -294,26 +374,25 @@ def _image_to_base64_impl(image_path: str) -> str:
         if not path.exists():
             return f"Error: Image file not found: {path}"
 
-        if path.suffix.lower() not in ALLOWED_EXTENSIONS:
-            return f"Error: Unsupported image format: {path.suffix}"
+        # One lookup both validates the extension and picks the MIME type
+        suffix = path.suffix
+        mime_type = MIME_TYPES.get(suffix.lower())
+        if mime_type is None:
+            return f"Error: Unsupported image format: {suffix}"
 
-        if path.stat().st_size > MAX_IMAGE_SIZE:
+        size = path.stat().st_size
+        if size > MAX_IMAGE_SIZE:
             return f"Error: Image file too large (max {MAX_IMAGE_SIZE // 1_000_000}MB)"
 
-        mime_types = {
-            ".png": "image/png",
-            ".jpg": "image/jpeg",
-            ".jpeg": "image/jpeg",
-            ".webp": "image/webp",
-            ".gif": "image/gif",
-        }
-
-        mime_type = mime_types.get(path.suffix.lower(), "image/png")
+        if size <= BASE64_STREAM_THRESHOLD:
+            return f"data:{mime_type};base64," + base64.b64encode(path.read_bytes()).decode("ascii")
 
+        # Stream large files so the raw bytes and their encoding are never both held in full
+        buf = bytearray(f"data:{mime_type};base64,".encode())
         with open(path, "rb") as f:
-            encoded = base64.b64encode(f.read()).decode("utf-8")
-
-        return f"data:{mime_type};base64,{encoded}"
+            while chunk := f.read(BASE64_CHUNK_SIZE):
+                buf += base64.b64encode(chunk)
+        return buf.decode("ascii")
 
     except Exception as e:
         return f"Error converting image to base64: {e}"
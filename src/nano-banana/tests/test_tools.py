@@ -53,6 +53,64 @@ class TestValidateOutputPath:
         assert output.parent.exists()
 
 
+class TestSaveImageFromResponse:
+    """Tests for _save_image_from_response and _response_text."""
+
+    @staticmethod
+    def _response(*parts):
+        from types import SimpleNamespace
+
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=list(parts)))])
+
+    def test_saves_first_inline_image(self, tmp_path):
+        from io import BytesIO
+        from types import SimpleNamespace
+
+        from PIL import Image
+
+        from nano_banana.tools import _save_image_from_response
+
+        buf = BytesIO()
+        Image.new("RGB", (2, 2), "red").save(buf, format="PNG")
+        response = self._response(
+            SimpleNamespace(text="here you go", inline_data=None),
+            SimpleNamespace(inline_data=SimpleNamespace(data=buf.getvalue(), mime_type="image/png")),
+        )
+        output = tmp_path / "out.png"
+
+        assert _save_image_from_response(response, output) == str(output)
+        # Matching format: the returned bytes are written unchanged
+        assert output.read_bytes() == buf.getvalue()
+
+    def test_converts_when_format_differs(self, tmp_path):
+        from io import BytesIO
+        from types import SimpleNamespace
+
+        from PIL import Image
+
+        from nano_banana.tools import _save_image_from_response
+
+        buf = BytesIO()
+        Image.new("RGB", (2, 2), "red").save(buf, format="PNG")
+        response = self._response(
+            SimpleNamespace(inline_data=SimpleNamespace(data=buf.getvalue(), mime_type="image/png"))
+        )
+        output = tmp_path / "out.jpg"
+
+        assert _save_image_from_response(response, output) == str(output)
+        assert Image.open(output).format == "JPEG"
+
+    def test_text_only_response(self, tmp_path):
+        from types import SimpleNamespace
+
+        from nano_banana.tools import _response_text, _save_image_from_response
+
+        response = self._response(SimpleNamespace(text="cannot draw that"))
+
+        assert _save_image_from_response(response, tmp_path / "out.png") is None
+        assert _response_text(response) == "cannot draw that"
+
+
 class TestLoadImage:
     """Tests for _load_image function."""
 
@@ -71,6 +129,18 @@ class TestLoadImage:
         with pytest.raises(ValueError, match="Unsupported image format"):
             _load_image(str(invalid_file))
 
+    def test_large_jpeg_decoded_at_reduced_scale(self, tmp_path):
+        from PIL import Image
+
+        from nano_banana.tools import MAX_IMAGE_DIMENSION, _load_image
+
+        jpeg_file = tmp_path / "large.jpg"
+        Image.new("RGB", (MAX_IMAGE_DIMENSION * 2, MAX_IMAGE_DIMENSION), "blue").save(jpeg_file)
+
+        img = _load_image(str(jpeg_file))
+
+        assert img.size == (MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION // 2)
+
 
 class TestGenerateImageImpl:
     """Tests for _generate_image_impl function."""
@@ -103,6 +173,15 @@ class TestGenerateImageImpl:
         assert "Error" in result
         assert "Unknown model" in result
 
+    @patch("nano_banana.tools._get_client")
+    def test_invalid_input_skips_client(self, mock_get_client, tmp_path):
+        from nano_banana.tools import _generate_image_impl
+
+        result = _generate_image_impl(prompt="test prompt", output_path=str(tmp_path / "test.txt"))
+
+        assert "must have image extension" in result
+        mock_get_client.assert_not_called()
+
     @patch("nano_banana.tools._get_client")
     @patch("nano_banana.tools._save_image_from_response")
     def test_successful_generation(self, mock_save, mock_get_client, tmp_path):
@@ -125,6 +204,20 @@ class TestGenerateImageImpl:
         mock_client.models.generate_content.assert_called_once()
 
 
+class TestGetClient:
+    """Tests for _get_client function."""
+
+    def test_client_reused_per_api_key(self, monkeypatch):
+        from nano_banana.tools import _get_client
+
+        monkeypatch.setenv("GEMINI_API_KEY", "test-key-a")
+        client_a = _get_client()
+        assert _get_client() is client_a
+
+        monkeypatch.setenv("GEMINI_API_KEY", "test-key-b")
+        assert _get_client() is not client_a
+
+
 class TestGenerateSlideAssetImpl:
     """Tests for _generate_slide_asset_impl function."""
 
@@ -157,6 +250,46 @@ class TestGenerateSlideAssetImpl:
         assert "Error" in result
         assert "Unknown theme" in result
 
+    @patch("nano_banana.tools._generate_image_impl")
+    def test_prompt_matches_template(self, mock_generate, tmp_path):
+        from nano_banana.tools import ASSET_PROMPTS, THEME_STYLES, _generate_slide_asset_impl
+
+        _generate_slide_asset_impl(
+            asset_type="hero",
+            description="a {braced} launch",
+            output_path=str(tmp_path / "test.png"),
+            theme="dark",
+        )
+
+        expected = ASSET_PROMPTS["hero"].format(desc="a {braced} launch", theme_style=THEME_STYLES["dark"])
+        assert mock_generate.call_args.kwargs["prompt"] == expected
+
+    @patch("nano_banana.tools._generate_image_impl")
+    def test_identical_request_reuses_output(self, mock_generate, tmp_path):
+        import os
+
+        from nano_banana.tools import _generate_slide_asset_impl
+
+        output = tmp_path / "icon.png"
+
+        def generate(prompt, output_path, model):
+            Path(output_path).write_bytes(b"image")
+            return f"Generated image saved to: {output_path}"
+
+        mock_generate.side_effect = generate
+
+        _generate_slide_asset_impl(asset_type="icon", description="rocket", output_path=str(output))
+        result = _generate_slide_asset_impl(asset_type="icon", description="rocket", output_path=str(output))
+        assert "reused" in result
+        assert mock_generate.call_count == 1
+
+        # A different description, or a file changed since, is generated again
+        _generate_slide_asset_impl(asset_type="icon", description="satellite", output_path=str(output))
+        assert mock_generate.call_count == 2
+        os.utime(output, ns=(0, 0))
+        _generate_slide_asset_impl(asset_type="icon", description="satellite", output_path=str(output))
+        assert mock_generate.call_count == 3
+
 
 class TestImageToBase64Impl:
     """Tests for _image_to_base64_impl function."""
@@ -197,6 +330,22 @@ class TestImageToBase64Impl:
         assert result.startswith("data:image/png;base64,")
         assert "iVBOR" in result  # PNG base64 signature
 
+    def test_streamed_conversion_matches_single_read(self, tmp_path, monkeypatch):
+        import base64
+
+        from nano_banana import tools
+
+        monkeypatch.setattr(tools, "BASE64_STREAM_THRESHOLD", 0)
+        monkeypatch.setattr(tools, "BASE64_CHUNK_SIZE", 3)
+
+        data = bytes(range(256)) * 3 + b"xy"  # Length not a multiple of 3
+        image_file = tmp_path / "test.webp"
+        image_file.write_bytes(data)
+
+        result = tools._image_to_base64_impl(str(image_file))
+
+        assert result == "data:image/webp;base64," + base64.b64encode(data).decode("ascii")
+
 
 class TestFuseImagesImpl:
     """Tests for _fuse_images_impl function."""
@@ -228,3 +377,37 @@ class TestFuseImagesImpl:
 
         assert "Error" in result
         assert "Maximum 5" in result
+
+    def test_missing_input_reported(self, tmp_path, monkeypatch):
+        from nano_banana.tools import _fuse_images_impl
+
+        monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+
+        result = _fuse_images_impl(
+            image_paths=[str(tmp_path / "a.png"), str(tmp_path / "b.png")],
+            prompt="test",
+            output_path=str(tmp_path / "output.png"),
+        )
+
+        assert "Error fusing images" in result
+        assert "not found" in result
+
+    @patch("nano_banana.tools._get_client")
+    @patch("nano_banana.tools._save_image_from_response")
+    def test_images_passed_in_input_order(self, mock_save, mock_get_client, tmp_path):
+        from PIL import Image
+
+        from nano_banana.tools import _fuse_images_impl
+
+        paths = []
+        for i, color in enumerate(["red", "green", "blue"]):
+            path = tmp_path / f"img{i}.png"
+            Image.new("RGB", (4, 4), color).save(path)
+            paths.append(str(path))
+        mock_save.return_value = str(tmp_path / "output.png")
+
+        _fuse_images_impl(image_paths=paths, prompt="combine", output_path=str(tmp_path / "output.png"))
+
+        contents = mock_get_client.return_value.models.generate_content.call_args.kwargs["contents"]
+        assert contents[0] == "combine"
+        assert [img.filename for img in contents[1:]] == paths